@@ -0,0 +1,62 @@
+"""Sign and verify throughput per JWT algorithm, with keys pre-parsed by the KeyRing vs. parsed per call.
+
+    python -m benchmarks.bench_jwt_keys --seconds 1
+"""
+import argparse
+import json
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+
+from src.security.keyring import JwtKey
+
+claims = {"iss": "ska_checklist", "username": "bench", "is_superuser": False}
+
+
+def _rate(call, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        call()
+        count += 1
+    return round(count / seconds, 1)
+
+
+def _pems(private_key) -> tuple[str, str]:
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                            serialization.NoEncryption()).decode()
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_pem, public_pem
+
+
+def main(seconds: float) -> list[dict]:
+    materials = {
+        "HS256": ("yqWlVAiIgqm1nqc5SEa1aM7C6lJ8JTrZ",) * 2,
+        "RS256": _pems(rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+        "ES256": _pems(ec.generate_private_key(ec.SECP256R1())),
+    }
+    results = []
+    for algorithm, (signing_material, verifying_material) in materials.items():
+        key = JwtKey.from_secret(signing_material, algorithm) if algorithm.startswith("HS") \
+            else JwtKey.from_pem("bench", algorithm, signing_material)
+        token = jwt.encode(claims, key.signing_key, algorithm=algorithm)
+        results.append({
+            "algorithm": algorithm,
+            "sign_per_s": _rate(lambda: jwt.encode(claims, key.signing_key, algorithm=algorithm), seconds),
+            "verify_per_s": _rate(lambda: jwt.decode(token, key.verifying_key, algorithms=[algorithm]), seconds),
+            "sign_unparsed_per_s": _rate(lambda: jwt.encode(claims, signing_material, algorithm=algorithm), seconds),
+            "verify_unparsed_per_s": _rate(lambda: jwt.decode(token, verifying_material, algorithms=[algorithm]),
+                                           seconds),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(main(args.seconds), indent=2))
@@ -0,0 +1,79 @@
+"""Reproducible synthetic checklist data: users, a layered random prerequisite DAG, tags and executions."""
+import random
+from datetime import datetime, timedelta
+
+from pydantic import BaseModel
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database._bulk import batched
+from src.database.tag_db import TagDB, task_tags
+from src.database.task_execution_db import TaskExecutionDB
+from src.database.tasks_db import TaskDB, task_prerequisites
+from src.database.user_db import UserDB
+
+
+class DatasetSpec(BaseModel):
+    users: int
+    tasks: int
+    depth: int
+    fan_out: int
+    tags: int
+    executions: int
+    # Each task gets between 0 and this many distinct tags.
+    tags_per_task: int = 2
+    seed: int = 0
+
+
+SCALES = {
+    "small": DatasetSpec(users=100, tasks=500, depth=5, fan_out=3, tags=20, executions=200),
+    "medium": DatasetSpec(users=1_000, tasks=5_000, depth=8, fan_out=4, tags=100, executions=2_000),
+    "large": DatasetSpec(users=10_000, tasks=50_000, depth=10, fan_out=5, tags=500, executions=20_000),
+}
+
+
+def generate(spec: DatasetSpec) -> dict[str, list[dict]]:
+    rng = random.Random(spec.seed)
+    epoch = datetime(2023, 1, 1)
+    users = [{"id": i, "username": f"user_{i}", "name": f"name_{i}", "surname": f"surname_{i}",
+              "password_hash": "x", "is_superuser": False, "created_at": epoch}
+             for i in range(1, spec.users + 1)]
+    tasks = [{"id": i, "name": f"task_{i}", "description": f"description {i}"} for i in range(1, spec.tasks + 1)]
+
+    # Tasks are spread over `depth` layers; prerequisites only point to earlier layers, so the graph is a DAG.
+    layers = [[] for _ in range(spec.depth)]
+    for task in tasks:
+        layers[rng.randrange(spec.depth)].append(task["id"])
+    edges = []
+    earlier = []
+    for layer in layers:
+        for task_id in layer:
+            for prerequisite_id in rng.sample(earlier, min(len(earlier), rng.randint(0, spec.fan_out))):
+                edges.append({"task_id": task_id, "prerequisite_id": prerequisite_id})
+        earlier.extend(layer)
+
+    tags = [{"id": i, "name": f"tag_{i}"} for i in range(1, spec.tags + 1)]
+    executed = rng.sample(range(1, spec.tasks + 1), min(spec.executions, spec.tasks))
+    executions = [{"id": i, "task_id": task_id, "user_id": rng.randint(1, spec.users),
+                   "execution_date": epoch + timedelta(minutes=rng.randrange(365 * 24 * 60))}
+                  for i, task_id in enumerate(executed, start=1)]
+    tagged = [{"task_id": task["id"], "tag_id": tag_id} for task in tasks
+              for tag_id in rng.sample(range(1, spec.tags + 1), min(spec.tags, rng.randint(0, spec.tags_per_task)))]
+    return {"users": users, "tasks": tasks, "task_prerequisites": edges, "tags": tags, "task_executions": executions,
+            "task_tags": tagged}
+
+
+def load(session_factory: sessionmaker, spec: DatasetSpec, batch_size: int = 5_000):
+    data = generate(spec)
+    tables = [("users", UserDB.__table__), ("tasks", TaskDB.__table__), ("task_prerequisites", task_prerequisites),
+              ("tags", TagDB.__table__), ("task_executions", TaskExecutionDB.__table__), ("task_tags", task_tags)]
+    with session_factory() as session, session.begin():
+        for name, table in tables:
+            for batch in batched(data[name], batch_size):
+                session.execute(insert(table), batch)
+        if session.get_bind().dialect.name == "postgresql":
+            # ids were inserted explicitly, so move the serial sequences past them
+            for name, table in tables:
+                if "id" in table.c and data[name]:
+                    session.execute(text(f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                                         f"(SELECT max(id) FROM {name}))"))
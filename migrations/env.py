@@ -0,0 +1,54 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import Column, create_engine
+
+from src.database._db import Base, _db_url
+# Imported for their side effect of registering the tables on Base.metadata.
+from src.database import tag_db, task_execution_db, tasks_db, user_db  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Expression indexes (the search indexes) are written by hand; autogenerate cannot compare their reflected form.
+    return not (type_ == "index" and any(not isinstance(expression, Column) for expression in object.expressions))
+
+
+def _url():
+    return config.get_main_option("sqlalchemy.url") or _db_url
+
+
+def run_migrations_offline():
+    context.configure(url=_url(), target_metadata=target_metadata, include_object=include_object,
+                      literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    engine = create_engine(_url())
+    try:
+        with engine.connect() as connection:
+            _run(connection)
+    finally:
+        engine.dispose()
+
+
+def _run(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,57 @@
+"""Baseline: the schema previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50), nullable=False, unique=True),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("surname", sa.String(50), nullable=False),
+        sa.Column("password_hash", sa.String(128), nullable=False),
+        sa.Column("is_superuser", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False, unique=True),
+        sa.Column("description", sa.String(50)),
+    )
+    op.create_table(
+        "task_prerequisites",
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id"), primary_key=True),
+        sa.Column("prerequisite_id", sa.Integer(), sa.ForeignKey("tasks.id"), primary_key=True),
+    )
+    op.create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(20), unique=True),
+    )
+    op.create_table(
+        "task_executions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id"), nullable=False, unique=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("execution_date", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("task_executions")
+    op.drop_table("tags")
+    op.drop_table("task_prerequisites")
+    op.drop_table("tasks")
+    op.drop_table("users")
@@ -0,0 +1,26 @@
+"""Indexes for executions by user and date, and tasks by prerequisite
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_task_executions_user_id_execution_date", "task_executions", ["user_id", "execution_date"],
+                    postgresql_include=["id", "task_id"])
+    op.create_index("ix_task_executions_execution_date", "task_executions", ["execution_date"])
+    op.create_index("ix_task_prerequisites_prerequisite_id_task_id", "task_prerequisites",
+                    ["prerequisite_id", "task_id"])
+
+
+def downgrade():
+    op.drop_index("ix_task_prerequisites_prerequisite_id_task_id", table_name="task_prerequisites")
+    op.drop_index("ix_task_executions_execution_date", table_name="task_executions")
+    op.drop_index("ix_task_executions_user_id_execution_date", table_name="task_executions")
@@ -0,0 +1,23 @@
+"""Materialized view of completions per day and user
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE MATERIALIZED VIEW daily_completions AS "
+               "SELECT date_trunc('day', execution_date) AS day, user_id, count(*) AS completions "
+               "FROM task_executions GROUP BY 1, 2")
+    op.execute("CREATE UNIQUE INDEX ix_daily_completions_day_user_id ON daily_completions (day, user_id)")
+
+
+def downgrade():
+    op.execute("DROP MATERIALIZED VIEW daily_completions")
@@ -0,0 +1,43 @@
+"""Change log of task_executions written by a trigger, for the incremental change feed
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "task_execution_changes",
+        sa.Column("seq", sa.BigInteger(), primary_key=True),
+        sa.Column("txid", sa.BigInteger(), nullable=False),
+        sa.Column("task_execution_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(6), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_task_execution_changes_txid_seq", "task_execution_changes", ["txid", "seq"])
+    op.execute("""
+CREATE OR REPLACE FUNCTION log_task_execution_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_execution_changes (txid, task_execution_id, op)
+    VALUES (pg_current_xact_id()::text::bigint, CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, lower(TG_OP));
+    PERFORM pg_notify('task_execution_changes', '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""")
+    op.execute("CREATE TRIGGER log_task_execution_change AFTER INSERT OR UPDATE OR DELETE ON task_executions "
+               "FOR EACH ROW EXECUTE FUNCTION log_task_execution_change()")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER log_task_execution_change ON task_executions")
+    op.execute("DROP FUNCTION log_task_execution_change()")
+    op.drop_index("ix_task_execution_changes_txid_seq", table_name="task_execution_changes")
+    op.drop_table("task_execution_changes")
@@ -0,0 +1,29 @@
+"""Full-text and prefix search indexes for tasks and users
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE INDEX ix_tasks_search ON tasks USING gin "
+               "(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '')))")
+    op.execute("CREATE INDEX ix_tasks_name_prefix ON tasks (lower(name) text_pattern_ops)")
+    op.execute("CREATE INDEX ix_users_search ON users USING gin "
+               "(to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(name, '') || ' ' || "
+               "coalesce(surname, '')))")
+    op.execute("CREATE INDEX ix_users_username_prefix ON users (lower(username) text_pattern_ops)")
+
+
+def downgrade():
+    op.drop_index("ix_users_username_prefix", table_name="users")
+    op.drop_index("ix_users_search", table_name="users")
+    op.drop_index("ix_tasks_name_prefix", table_name="tasks")
+    op.drop_index("ix_tasks_search", table_name="tasks")
@@ -0,0 +1,87 @@
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.schemas.bulk import BulkInsertResult
+
+
+def batched(rows: Iterable, batch_size: int) -> Iterator[list]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def dialect_insert(session: Session, table: Table):
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+def insert_batch(session: Session, table: Table, rows: list[dict], key: str, update_columns: list[str]):
+    statement = dialect_insert(session, table).values(rows)
+    if update_columns:
+        statement = statement.on_conflict_do_update(
+            index_elements=[key], set_={column: statement.excluded[column] for column in update_columns})
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[key])
+    return session.execute(statement.returning(table.c.id, table.c[key])).all()
+
+
+def bulk_insert(session_factory: sessionmaker, table: Table, rows: Iterable[dict], key: str,
+                update_columns: list[str] | None = None, batch_size: int = 1000) -> BulkInsertResult:
+    # Inserts rows as multi-row INSERT ... ON CONFLICT statements, one transaction per batch. Rows whose key
+    # already exists are reported as conflicts (or updated when update_columns is given); a batch that hits
+    # any other IntegrityError is retried row by row so only the offending rows are reported.
+    result = BulkInsertResult()
+    for batch in batched(rows, batch_size):
+        unique = _unique(batch, key, update_columns, result)
+        with session_factory() as session, session.begin():
+            written = _write_batch(session, table, list(unique.values()), key, update_columns)
+        _record(result, unique, written)
+    return result
+
+
+async def bulk_insert_async(session_factory: async_sessionmaker, table: Table, rows: Iterable[dict], key: str,
+                            update_columns: list[str] | None = None, batch_size: int = 1000) -> BulkInsertResult:
+    result = BulkInsertResult()
+    for batch in batched(rows, batch_size):
+        unique = _unique(batch, key, update_columns, result)
+        async with session_factory() as session, session.begin():
+            written = await session.run_sync(_write_batch, table, list(unique.values()), key, update_columns)
+        _record(result, unique, written)
+    return result
+
+
+def _unique(batch: list[dict], key: str, update_columns: list[str] | None, result: BulkInsertResult) -> dict:
+    unique = {}
+    for row in batch:
+        if row[key] in unique and not update_columns:
+            result.conflicts.append(row[key])
+        unique[row[key]] = row
+    return unique
+
+
+def _write_batch(session: Session, table: Table, rows: list[dict], key: str, update_columns: list[str] | None):
+    try:
+        with session.begin_nested():
+            return insert_batch(session, table, rows, key, update_columns)
+    except IntegrityError:
+        written = []
+        for row in rows:
+            try:
+                with session.begin_nested():
+                    written += insert_batch(session, table, [row], key, update_columns)
+            except IntegrityError:
+                pass
+        return written
+
+
+def _record(result: BulkInsertResult, unique: dict, written: list):
+    written_keys = {row_key for _, row_key in written}
+    result.ids.extend(id for id, _ in written)
+    result.conflicts.extend(row_key for row_key in unique if row_key not in written_keys)
@@ -0,0 +1,70 @@
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet
+from sqlalchemy import Select
+from sqlalchemy.engine import Dialect
+
+_POSTGRES_EPOCH_US = 946_684_800_000_000  # 2000-01-01 in microseconds since 1970-01-01
+_COPY_HEADER = 19  # signature, flags and an empty header extension
+_COPY_TRAILER = 2
+_WIRE_TYPES = {"i4": ">i4", "i8": ">i8", "M8[us]": ">i8"}
+
+
+def structured_dtype(fields: Sequence[tuple[str, str]]) -> np.dtype:
+    return np.dtype(list(fields))
+
+
+def from_rows(rows: Iterable[Sequence], fields: Sequence[tuple[str, str]]) -> np.ndarray:
+    # Fallback for drivers without COPY; None timestamps become NaT.
+    return np.array([tuple(row) for row in rows], dtype=structured_dtype(fields))
+
+
+def literal_sql(query: Select, dialect: Dialect) -> str:
+    return str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def copy_binary_sql(query: Select, dialect: Dialect) -> str:
+    return f"COPY ({literal_sql(query, dialect)}) TO STDOUT WITH BINARY"
+
+
+def decode_copy_binary(data: bytes | memoryview, fields: Sequence[tuple[str, str]]) -> np.ndarray:
+    # Every row of Postgres' binary COPY format is a field count followed by (length, value) pairs, so with
+    # fixed-width, non-null columns the whole body is one big-endian structured array. Timestamps are
+    # microseconds since 2000-01-01; -infinity (INT64_MIN) is the same bit pattern as NaT and stays NaT.
+    wire = [("count", ">i2")]
+    for name, dtype in fields:
+        wire += [(f"{name}_length", ">i4"), (name, _WIRE_TYPES[dtype])]
+    body = np.frombuffer(data, dtype=np.dtype(wire), offset=_COPY_HEADER,
+                         count=(len(data) - _COPY_HEADER - _COPY_TRAILER) // np.dtype(wire).itemsize)
+    if len(body) and ((body["count"] != len(fields)).any() or any(
+            (body[f"{name}_length"] != np.dtype(dtype).itemsize).any() for name, dtype in fields)):
+        raise ValueError("COPY output does not have the expected fixed-width, non-null columns")
+    result = np.empty(len(body), dtype=structured_dtype(fields))
+    for name, dtype in fields:
+        if dtype == "M8[us]":
+            micros = body[name].astype(np.int64)
+            result[name] = np.where(micros == np.iinfo(np.int64).min, micros, micros + _POSTGRES_EPOCH_US).view(dtype)
+        else:
+            result[name] = body[name]
+    return result
+
+
+def arrow_schema(fields: Sequence[tuple[str, str]]) -> pa.Schema:
+    return pa.schema([(name, pa.from_numpy_dtype(np.dtype(dtype))) for name, dtype in fields])
+
+
+def to_record_batch(array: np.ndarray, schema: pa.Schema) -> pa.RecordBatch:
+    # from_pandas makes NaT a null instead of the minimum timestamp.
+    return pa.RecordBatch.from_arrays([pa.array(array[name], from_pandas=True) for name in schema.names], schema=schema)
+
+
+def write_parquet(batches: Iterable[pa.RecordBatch], path: str, schema: pa.Schema) -> int:
+    # Streams the batches into one Parquet file, so only one batch is in memory; returns the rows written.
+    rows = 0
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
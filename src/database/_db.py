@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine, URL
+from sqlalchemy import create_engine, make_url, URL, Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from src.config import get_settings
+from src.config import get_settings, Settings
+from ._pool import MeteredQueuePool, MeteredAsyncAdaptedQueuePool, PoolMetrics
+from ._routing import ReplicaRouter, RoutingSession
+from .instrumentation import instrument_engine
 
 Base = declarative_base()
 
@@ -15,10 +19,65 @@ _db_url = URL.create(
     port=settings.db_port
 )
 
-engine = create_engine(_db_url)
+_async_db_url = _db_url.set(drivername="postgresql+asyncpg")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _engine_options(settings: Settings, is_async: bool = False) -> dict:
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if settings.db_pool_metrics:
+        options["poolclass"] = MeteredAsyncAdaptedQueuePool if is_async else MeteredQueuePool
+    if settings.db_statement_timeout_ms:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+
+engine = create_engine(_db_url, **_engine_options(settings))
+
+async_engine = create_async_engine(_async_db_url, **_engine_options(settings, is_async=True))
+
+replica_engines = [create_engine(url, **_engine_options(settings)) for url in settings.db_replica_urls]
+
+async_replica_engines = [create_async_engine(make_url(url).set(drivername="postgresql+asyncpg"),
+                                             **_engine_options(settings, is_async=True))
+                         for url in settings.db_replica_urls]
+
+for _engine in [engine, async_engine.sync_engine, *replica_engines, *(e.sync_engine for e in async_replica_engines)]:
+    instrument_engine(_engine)
+
+
+def _router(primary: Engine, replicas: list[Engine], settings: Settings) -> ReplicaRouter | None:
+    if not replicas:
+        return None
+    return ReplicaRouter(primary, replicas, strategy=settings.db_replica_strategy, max_lag=settings.db_replica_max_lag,
+                         lag_check_interval=settings.db_replica_lag_check_interval)
+
+
+router = _router(engine, replica_engines, settings)
+
+async_router = _router(async_engine.sync_engine, [e.sync_engine for e in async_replica_engines], settings)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, router=router)
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine,
+                                       sync_session_class=RoutingSession, router=async_router)
 
 
 def get_session_factory():
     return SessionLocal
+
+
+def get_async_session_factory():
+    return AsyncSessionLocal
+
+
+def get_pool_metrics(engine: Engine = engine) -> PoolMetrics | None:
+    return getattr(engine.pool, "metrics", None)
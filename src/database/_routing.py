@@ -0,0 +1,128 @@
+import itertools
+import math
+import threading
+import time
+from collections.abc import Callable, Sequence
+from contextvars import ContextVar
+from typing import Literal, TypeVar
+
+from sqlalchemy import Connection, Engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+Strategy = Literal["round_robin", "least_connections"]
+
+S = TypeVar("S", Session, AsyncSession)
+
+# Set per request (FastAPI runs each request in its own context), so only the writer's own reads stick to the primary.
+_wrote_at: ContextVar[float | None] = ContextVar("wrote_at", default=None)
+
+_PRIMARY = "use_primary"
+
+_PRIMARY_LSN = text("SELECT pg_current_wal_lsn()::text")
+# 0 once the replica has replayed everything the primary had written when it was asked, else the seconds since
+# the last transaction it replayed. A replica whose WAL receiver disconnected stops replaying, so its lag keeps
+# growing instead of looking caught up. 0 as well for a server that is not a replica at all.
+_LAG = text("SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_replay_lsn() >= CAST(CAST(:primary_lsn AS text) AS pg_lsn) THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity') END")
+
+
+def measure_lag(primary: Engine, replica: Engine) -> float:
+    if replica.dialect.name != "postgresql":
+        return 0.0
+    try:
+        with primary.connect() as connection:
+            primary_lsn = connection.scalar(_PRIMARY_LSN)
+        with replica.connect() as connection:
+            return float(connection.scalar(_LAG, {"primary_lsn": primary_lsn}))
+    except (DBAPIError, OSError):
+        # An unreachable server is as good as infinitely behind; asyncpg raises connection failures as OSErrors.
+        return math.inf
+
+
+def _checked_out(engine: Engine) -> int:
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return checkedout() if checkedout else 0
+
+
+class ReplicaRouter:
+    # Picks the engine for read-only sessions. Replicas more than max_lag seconds behind are skipped, and reads
+    # fall back to the primary when none is left. For max_lag seconds after a write, reads in the same context
+    # stay on the primary too, since a replica still in use may not have replayed that write yet.
+    def __init__(self, primary: Engine, replicas: Sequence[Engine], strategy: Strategy = "round_robin",
+                 max_lag: float = 5.0, lag_check_interval: float = 1.0,
+                 lag: Callable[[Engine, Engine], float] = measure_lag, clock: Callable[[], float] = time.monotonic):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy {strategy}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._lag = lag
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._lags: dict[Engine, tuple[float, float]] = {}
+
+    def wrote(self):
+        _wrote_at.set(self._clock())
+
+    def read_engine(self) -> Engine:
+        wrote_at = _wrote_at.get()
+        if wrote_at is not None and self._clock() - wrote_at < self.max_lag:
+            return self.primary
+        replicas = [replica for replica in self.replicas if self.lag(replica) <= self.max_lag]
+        if not replicas:
+            return self.primary
+        if self.strategy == "least_connections":
+            return min(replicas, key=_checked_out)
+        return replicas[next(self._turn) % len(replicas)]
+
+    def lag(self, replica: Engine) -> float:
+        # Measured at most once per lag_check_interval per replica; concurrent readers may both measure.
+        now = self._clock()
+        with self._lock:
+            checked_at, lag = self._lags.get(replica, (-math.inf, math.inf))
+        if now - checked_at < self.lag_check_interval:
+            return lag
+        lag = self._lag(self.primary, replica)
+        with self._lock:
+            self._lags[replica] = (now, lag)
+        return lag
+
+
+class RoutingSession(Session):
+    # Sessions that begin a transaction (every DAO write does) or flush go to the primary. Any other session reads
+    # from one engine picked by the router for its whole lifetime, so its statements see a single server.
+    # Without a router, or when bound to a connection (a unit of work), it is a plain Session.
+    def __init__(self, *args, router: ReplicaRouter | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._writing = False
+        self._reader: Engine | None = None
+
+    def begin(self, nested: bool = False):
+        self._writing = True
+        return super().begin(nested)
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.router is None or isinstance(self.bind, Connection):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._writing or self._flushing:
+            self.router.wrote()
+            return self.router.primary
+        if self.info.get(_PRIMARY):
+            return self.router.primary
+        if self._reader is None:
+            self._reader = self.router.read_engine()
+        return self._reader
+
+
+def use_primary(session: S) -> S:
+    # For reads that must not lag (LISTEN, change feed cursors, caches that outlive the session); a no-op without
+    # replicas. Takes effect from the session's next statement.
+    session.info[_PRIMARY] = True
+    return session
@@ -0,0 +1,53 @@
+from collections.abc import Callable, Sequence
+from functools import cache
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Row, Select, inspect, select, update
+from sqlalchemy.orm import Session
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def schema_columns(schema: type[BaseModel], entity: Any) -> list:
+    return [getattr(entity, name) for name in schema.__fields__]
+
+
+def select_schema(schema: type[BaseModel], entity: Any) -> Select:
+    # Selects exactly the schema's fields as plain columns, so no ORM entities are built for the rows.
+    return select(*schema_columns(schema, entity))
+
+
+def update_by_id(session: Session, entity: Any, id: int, values: dict[str, Any], returning: Sequence) -> Row | None:
+    # One UPDATE ... RETURNING instead of loading the entity, setting attributes and flushing; None when there is
+    # no such row. As with setattr on a loaded entity, unknown attributes raise only once the row is known to exist.
+    columns = inspect(entity).column_attrs
+    unknown = next((key for key in values if key not in columns), None)
+    if unknown is not None or not values:
+        row = session.execute(select(*returning).where(entity.id == id)).first()
+        if row is not None and unknown is not None:
+            raise AttributeError(f"{entity.__name__} has no attribute {unknown}")
+        return row
+    return session.execute(update(entity).where(entity.id == id).values(values).returning(*returning)
+                           .execution_options(synchronize_session=False)).first()
+
+
+@cache
+def row_builder(schema: type[M]) -> Callable[[Sequence], M]:
+    # Rows from select_schema come from our own constrained tables, so they are trusted like construct() would
+    # trust them, only without construct()'s per-field default handling. A NULL from a nullable column in a field
+    # that doesn't allow None isn't: such rows are validated, so they fail as from_orm would.
+    fields = tuple(schema.__fields__)
+    not_none = tuple(index for index, field in enumerate(schema.__fields__.values()) if not field.allow_none)
+    new = object.__new__
+    set_attribute = object.__setattr__
+
+    def build(row: Sequence) -> M:
+        if any(row[index] is None for index in not_none):
+            return schema.parse_obj(dict(zip(fields, row)))
+        model = new(schema)
+        set_attribute(model, "__dict__", dict(zip(fields, row)))
+        set_attribute(model, "__fields_set__", set(fields))
+        return model
+
+    return build
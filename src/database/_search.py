@@ -0,0 +1,77 @@
+import re
+
+from sqlalchemy import (DDL, Column, Index, Integer, Select, Table, TextualSelect, event, func, literal_column, select,
+                        text)
+from sqlalchemy.orm import Session
+
+# Letters and digits only, so user input can never carry tsquery or FTS5 syntax.
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _words(query: str) -> list[str]:
+    return _WORD.findall(query.lower())
+
+
+def _document(*columns: Column):
+    # Must stay identical to the search_index expression for Postgres to use the index.
+    # Literals rather than bound parameters, which would not match the index expression with server-side binding.
+    empty, space = literal_column("''"), literal_column("' '")
+    joined = func.coalesce(columns[0], empty)
+    for column in columns[1:]:
+        joined = joined.concat(space).concat(func.coalesce(column, empty))
+    return func.to_tsvector(literal_column("'simple'"), joined)
+
+
+def search_index(name: str, *columns: Column) -> Index:
+    return Index(name, _document(*columns), postgresql_using="gin").ddl_if(dialect="postgresql")
+
+
+def prefix_index(name: str, column: Column) -> Index:
+    return Index(name, func.lower(column).label("prefix"),
+                 postgresql_ops={"prefix": "text_pattern_ops"}).ddl_if(dialect="postgresql")
+
+
+def fts5_fallback(table: Table, *columns: str):
+    # SQLite stand-in for the Postgres indexes: an external-content FTS5 table kept in sync by triggers.
+    name = f"{table.name}_fts"
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    insert = f"INSERT INTO {name}(rowid, {names}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {name}({name}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    for statement in [
+        f"CREATE VIRTUAL TABLE {name} USING fts5({names}, content='{table.name}', content_rowid='id')",
+        f"CREATE TRIGGER {name}_insert AFTER INSERT ON {table.name} BEGIN {insert} END",
+        f"CREATE TRIGGER {name}_delete AFTER DELETE ON {table.name} BEGIN {delete} END",
+        f"CREATE TRIGGER {name}_update AFTER UPDATE ON {table.name} BEGIN {delete} {insert} END",
+    ]:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(table, "after_drop", DDL(f"DROP TABLE IF EXISTS {name}").execute_if(dialect="sqlite"))
+
+
+def search_ids(session: Session, table: Table, columns: list[Column], query: str, limit: int,
+               offset: int) -> Select | TextualSelect | None:
+    # Ids of the rows matching every word of query as a prefix, best ranked first; None when there is nothing to match.
+    words = _words(query)
+    if not words:
+        return None
+    if session.get_bind().dialect.name == "sqlite":
+        name = f"{table.name}_fts"
+        return text(f"SELECT rowid AS id FROM {name} WHERE {name} MATCH :match ORDER BY bm25({name}), rowid "
+                    f"LIMIT :limit OFFSET :offset") \
+            .bindparams(match=" ".join(f'"{word}"*' for word in words), limit=limit, offset=offset) \
+            .columns(id=Integer)
+    document = _document(*columns)
+    tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{word}:*" for word in words))
+    return select(table.c.id) \
+        .where(document.op("@@")(tsquery)) \
+        .order_by(func.ts_rank(document, tsquery).desc(), table.c.id) \
+        .limit(limit).offset(offset)
+
+
+def autocomplete(column: Column, prefix: str, limit: int) -> Select:
+    pattern = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return select(column) \
+        .where(func.lower(column).like(pattern, escape="\\")) \
+        .order_by(func.lower(column)) \
+        .limit(limit)
@@ -0,0 +1,25 @@
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from pydantic import BaseModel
+from sqlalchemy import Select, ColumnElement
+
+
+def keyset_page(query: Select, key: ColumnElement, after: int | None, limit: int) -> Select:
+    if after is not None:
+        query = query.where(key > after)
+    return query.order_by(key).limit(limit)
+
+
+def ndjson(models: Iterable[BaseModel]) -> Iterator[str]:
+    # e.g. StreamingResponse(ndjson(dao.iter_users()), media_type="application/x-ndjson")
+    for model in models:
+        yield model.json() + "\n"
+
+
+async def server_sent_events(models: AsyncIterable[BaseModel], event: str = "message",
+                             id_field: str | None = None) -> AsyncIterator[str]:
+    # e.g. StreamingResponse(server_sent_events(dao.watch_task_executions(cursor), "changes", "cursor"),
+    #                        media_type="text/event-stream"); a reconnecting client sends the id as Last-Event-ID.
+    async for model in models:
+        event_id = f"id: {getattr(model, id_field)}\n" if id_field else ""
+        yield f"{event_id}event: {event}\ndata: {model.json()}\n\n"
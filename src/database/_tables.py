@@ -0,0 +1,4 @@
+from sqlalchemy import Integer, column, table
+
+# tasks_db imports the modules that join against the task catalogue, so they use this lightweight table instead.
+tasks_table = table("tasks", column("id", Integer))
@@ -0,0 +1,239 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import Engine, event
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class Invocation:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.pool_wait = 0.0
+
+    def add(self, other: "Invocation"):
+        self.statements += other.statements
+        self.rows += other.rows
+        self.pool_wait += other.pool_wait
+
+
+_current: ContextVar[Invocation | None] = ContextVar("dao_invocation", default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _MethodMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.statements = 0
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.duration = _Histogram(DURATION_BUCKETS)
+        self.statements_per_call = _Histogram(STATEMENT_BUCKETS)
+
+
+class QueryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods: dict[str, _MethodMetrics] = {}
+
+    def observe(self, method: str, invocation: Invocation, elapsed: float):
+        with self._lock:
+            metrics = self._methods.setdefault(method, _MethodMetrics())
+            metrics.calls += 1
+            metrics.statements += invocation.statements
+            metrics.rows += invocation.rows
+            metrics.pool_wait += invocation.pool_wait
+            metrics.duration.observe(elapsed)
+            metrics.statements_per_call.observe(invocation.statements)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {method: {"calls": metrics.calls, "statements": metrics.statements, "rows": metrics.rows,
+                             "pool_wait_seconds": metrics.pool_wait, "seconds": metrics.duration.sum}
+                    for method, metrics in self._methods.items()}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+    def render_prometheus(self, prefix: str = "dao") -> str:
+        lines = []
+        with self._lock:
+            methods = sorted(self._methods.items())
+            for name, attribute in [("calls", "calls"), ("statements", "statements"), ("rows", "rows"),
+                                    ("pool_wait_seconds", "pool_wait")]:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.extend(f'{prefix}_{name}_total{{method="{method}"}} {getattr(metrics, attribute)}'
+                             for method, metrics in methods)
+            for name, attribute in [("duration_seconds", "duration"), ("statements_per_call", "statements_per_call")]:
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for method, metrics in methods:
+                    histogram = getattr(metrics, attribute)
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{prefix}_{name}_bucket{{method="{method}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{prefix}_{name}_sum{{method="{method}"}} {histogram.sum}')
+                    lines.append(f'{prefix}_{name}_count{{method="{method}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+query_metrics = QueryMetrics()
+
+
+@contextmanager
+def _active(invocation: Invocation):
+    token = _current.set(invocation)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def track() -> Iterator[Invocation]:
+    # Collects everything executed in the current context, e.g. to assert a query budget.
+    invocation = Invocation()
+    parent = _current.get()
+    try:
+        with _active(invocation):
+            yield invocation
+    finally:
+        if parent is not None:
+            parent.add(invocation)
+
+
+@contextmanager
+def _observed(method: str) -> Iterator[Invocation]:
+    start = time.perf_counter()
+    with track() as invocation:
+        try:
+            yield invocation
+        finally:
+            query_metrics.observe(method, invocation, time.perf_counter() - start)
+
+
+def instrumented(fn):
+    # Generators may be resumed from other contexts (e.g. a StreamingResponse iterating in a threadpool),
+    # so their invocation is only made current while each item is being produced.
+    method = fn.__qualname__
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            invocation = Invocation()
+            start = time.perf_counter()
+            generator = fn(*args, **kwargs)
+            try:
+                while True:
+                    with _active(invocation):
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            return
+                    yield item
+            finally:
+                await generator.aclose()
+                query_metrics.observe(method, invocation, time.perf_counter() - start)
+    elif inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _observed(method):
+                return await fn(*args, **kwargs)
+    elif inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            invocation = Invocation()
+            start = time.perf_counter()
+            generator = fn(*args, **kwargs)
+            try:
+                while True:
+                    with _active(invocation):
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                generator.close()
+                query_metrics.observe(method, invocation, time.perf_counter() - start)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _observed(method):
+                return fn(*args, **kwargs)
+    return wrapper
+
+
+def instrument_methods(cls):
+    for name, attribute in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attribute):
+            setattr(cls, name, instrumented(attribute))
+    return cls
+
+
+def record_pool_wait(seconds: float):
+    # Fed by the metered pools, i.e. only when Settings.db_pool_metrics is enabled.
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.pool_wait += seconds
+
+
+class _CountingCursor:
+    # Counts rows as the result fetches them: rowcount is -1 for server-side cursors and most asyncpg SELECTs, and
+    # counts affected rather than returned rows for DML. Rows fetched later (e.g. by a generator resumed elsewhere)
+    # still count towards the invocation that executed the statement.
+    def __init__(self, cursor, invocation: Invocation):
+        self._cursor = cursor
+        self._invocation = invocation
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._invocation.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._invocation.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._invocation.rows += len(rows)
+        return rows
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.statements += 1
+        if context is not None and not isinstance(context.cursor, _CountingCursor):
+            context.cursor = _CountingCursor(context.cursor, invocation)
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
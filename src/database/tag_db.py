@@ -1,12 +1,20 @@
+from collections.abc import Iterable, Iterator, AsyncIterator
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Table, cast, delete, func, literal, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 
-from src.schemas.tags import CreateTag, Tag
-from ._db import Base, get_session_factory
+from src.schemas.bulk import BulkInsertResult
+from src.schemas.tags import CreateTag, Tag, TagCount
+from ._bulk import batched, bulk_insert, bulk_insert_async, dialect_insert
+from ._db import Base, get_session_factory, get_async_session_factory
+from ._rows import row_builder, select_schema
+from ._streaming import keyset_page
+from ._tables import tasks_table
+from .instrumentation import instrument_methods
 
 
 class TagDB(Base):
@@ -18,6 +26,61 @@ class TagDB(Base):
         return f'User {self.name}'
 
 
+task_tags = Table(
+    "task_tags",
+    Base.metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key serves the tags of a task; this one serves the tasks of a tag.
+    Index("ix_task_tags_tag_id_task_id", "tag_id", "task_id"),
+)
+
+_tag = row_builder(Tag)
+_tag_count = row_builder(TagCount)
+
+
+def _tag_tasks(session: Session, tag_id: int, task_ids: Iterable[int], batch_size: int) -> int:
+    # Unknown task ids are skipped rather than failing the whole batch on the foreign key.
+    if session.get(TagDB, tag_id) is None:
+        raise TagNotFound(tag_id)
+    tagged = 0
+    for batch in batched(task_ids, batch_size):
+        existing = select(tasks_table.c.id, cast(literal(tag_id), Integer)).where(tasks_table.c.id.in_(batch))
+        statement = dialect_insert(session, task_tags).from_select(["task_id", "tag_id"], existing)
+        tagged += session.execute(statement.on_conflict_do_nothing()).rowcount
+    return tagged
+
+
+def _untag_tasks(session: Session, tag_id: int, task_ids: Iterable[int], batch_size: int) -> int:
+    untagged = 0
+    for batch in batched(task_ids, batch_size):
+        untagged += session.execute(
+            delete(task_tags).where(task_tags.c.tag_id == tag_id, task_tags.c.task_id.in_(batch))).rowcount
+    return untagged
+
+
+def _delete_tag(session: Session, id: int):
+    if session.scalar(delete(TagDB).where(TagDB.id == id).returning(TagDB.id)) is None:
+        raise TagNotFound(id)
+
+
+def _get_tag_counts(session: Session) -> list[TagCount]:
+    rows = session.execute(select(TagDB.name, TagDB.id, func.count(task_tags.c.task_id))
+                           .outerjoin(task_tags, task_tags.c.tag_id == TagDB.id)
+                           .group_by(TagDB.id)
+                           .order_by(TagDB.id))
+    return [_tag_count(row) for row in rows]
+
+
+def _get_tags_by_task(session: Session, task_id: int) -> list[Tag]:
+    rows = session.execute(select_schema(Tag, TagDB)
+                           .join(task_tags, task_tags.c.tag_id == TagDB.id)
+                           .where(task_tags.c.task_id == task_id)
+                           .order_by(TagDB.id))
+    return [_tag(row) for row in rows]
+
+
+@instrument_methods
 class TagDAO:
     def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)]):
         self.Session = session_factory
@@ -40,8 +103,20 @@ class TagDAO:
 
     def get_all_tags(self) -> list[Tag]:
         with self.Session() as session:
-            tags = session.query(TagDB).all()
-        return [Tag.from_orm(tag) for tag in tags]
+            tags = session.execute(select_schema(Tag, TagDB)).all()
+        return [_tag(tag) for tag in tags]
+
+    def get_tags_page(self, after_id: int | None = None, limit: int = 100) -> list[Tag]:
+        with self.Session() as session:
+            tags = session.execute(keyset_page(select_schema(Tag, TagDB), TagDB.id, after_id, limit)).all()
+        return [_tag(tag) for tag in tags]
+
+    def iter_tags(self, batch_size: int = 1000) -> Iterator[Tag]:
+        with self.Session() as session:
+            tags = session.execute(
+                select_schema(Tag, TagDB).order_by(TagDB.id).execution_options(yield_per=batch_size))
+            for tag in tags:
+                yield _tag(tag)
 
     def add_tag(self, tag: CreateTag):
         try:
@@ -52,13 +127,97 @@ class TagDAO:
         except IntegrityError as e:
             raise TagAlreadyExists(tag.name) from e
 
+    def add_tags_bulk(self, tags: Iterable[CreateTag], batch_size: int = 1000) -> BulkInsertResult:
+        return bulk_insert(self.Session, TagDB.__table__, ({"name": tag.name} for tag in tags), key="name",
+                           batch_size=batch_size)
+
     def delete_tag(self, id: int):
         with self.Session() as session, session.begin():
-            tagdb: TagDB = session.get(TagDB,id)
-            if not tagdb:
-                raise TagNotFound(id)
-            session.delete(tagdb)
-            session.commit()
+            _delete_tag(session, id)
+
+    def tag_tasks(self, tag_id: int, task_ids: Iterable[int], batch_size: int = 1000) -> int:
+        with self.Session() as session, session.begin():
+            return _tag_tasks(session, tag_id, task_ids, batch_size)
+
+    def untag_tasks(self, tag_id: int, task_ids: Iterable[int], batch_size: int = 1000) -> int:
+        with self.Session() as session, session.begin():
+            return _untag_tasks(session, tag_id, task_ids, batch_size)
+
+    def get_tag_counts(self) -> list[TagCount]:
+        with self.Session() as session:
+            return _get_tag_counts(session)
+
+    def get_tags_by_task(self, task_id: int) -> list[Tag]:
+        with self.Session() as session:
+            return _get_tags_by_task(session, task_id)
+
+
+@instrument_methods
+class AsyncTagDAO:
+    def __init__(self, session_factory: Annotated[async_sessionmaker, Depends(get_async_session_factory)]):
+        self.Session = session_factory
+
+    async def get_tag_by_id(self, id: int) -> Tag | None:
+        async with self.Session() as session:
+            tagdb: TagDB | None = await session.get(TagDB, id)
+        if tagdb is None:
+            return None
+        return Tag.from_orm(tagdb)
+
+    async def get_tag_by_name(self, name: str) -> Tag | None:
+        async with self.Session() as session:
+            tagdb = await session.scalar(select(TagDB).filter(TagDB.name == name))
+        if not tagdb:
+            return None
+        return Tag.from_orm(tagdb)
+
+    async def get_all_tags(self) -> list[Tag]:
+        async with self.Session() as session:
+            tags = (await session.execute(select_schema(Tag, TagDB))).all()
+        return [_tag(tag) for tag in tags]
+
+    async def get_tags_page(self, after_id: int | None = None, limit: int = 100) -> list[Tag]:
+        async with self.Session() as session:
+            tags = (await session.execute(keyset_page(select_schema(Tag, TagDB), TagDB.id, after_id, limit))).all()
+        return [_tag(tag) for tag in tags]
+
+    async def iter_tags(self, batch_size: int = 1000) -> AsyncIterator[Tag]:
+        async with self.Session() as session:
+            tags = await session.stream(
+                select_schema(Tag, TagDB).order_by(TagDB.id).execution_options(yield_per=batch_size))
+            async for tag in tags:
+                yield _tag(tag)
+
+    async def add_tag(self, tag: CreateTag):
+        try:
+            async with self.Session() as session, session.begin():
+                session.add(TagDB(name=tag.name))
+        except IntegrityError as e:
+            raise TagAlreadyExists(tag.name) from e
+
+    async def add_tags_bulk(self, tags: Iterable[CreateTag], batch_size: int = 1000) -> BulkInsertResult:
+        return await bulk_insert_async(self.Session, TagDB.__table__, ({"name": tag.name} for tag in tags), key="name",
+                                       batch_size=batch_size)
+
+    async def delete_tag(self, id: int):
+        async with self.Session() as session, session.begin():
+            await session.run_sync(_delete_tag, id)
+
+    async def tag_tasks(self, tag_id: int, task_ids: Iterable[int], batch_size: int = 1000) -> int:
+        async with self.Session() as session, session.begin():
+            return await session.run_sync(_tag_tasks, tag_id, task_ids, batch_size)
+
+    async def untag_tasks(self, tag_id: int, task_ids: Iterable[int], batch_size: int = 1000) -> int:
+        async with self.Session() as session, session.begin():
+            return await session.run_sync(_untag_tasks, tag_id, task_ids, batch_size)
+
+    async def get_tag_counts(self) -> list[TagCount]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_tag_counts)
+
+    async def get_tags_by_task(self, task_id: int) -> list[Tag]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_tags_by_task, task_id)
 
 
 class TagAlreadyExists(Exception):
@@ -1,13 +1,31 @@
+import asyncio
 import datetime
-from typing import Annotated
+import io
+from collections.abc import Iterable, Iterator, AsyncIterator
+from contextlib import suppress
+from typing import Annotated, Any, Literal
 
 from fastapi import Depends
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime, Float, ForeignKey, Index, Select, DDL, cast,
+                        column, delete, event, func, literal_column, select, table, text, tuple_)
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 
-from src.database._db import get_session_factory, Base
-from src.schemas.task_executions import TaskExecution, CreateTaskExecution
+from src.database._bulk import bulk_insert, bulk_insert_async
+from src.database._columnar import (arrow_schema, copy_binary_sql, decode_copy_binary, from_rows, literal_sql,
+                                    to_record_batch, write_parquet)
+from src.database._db import get_session_factory, get_async_session_factory, Base
+from src.database._routing import use_primary
+from src.database._rows import row_builder, select_schema
+from src.database._streaming import keyset_page
+from src.database._tables import tasks_table
+from src.database.instrumentation import instrument_methods
+from src.database.user_db import UserDB
+from src.schemas.bulk import BulkInsertResult
+from src.schemas.task_executions import (TaskExecution, CreateTaskExecution, TaskCompletions, UserCompletions,
+                                         PeriodCompletions, TimeToComplete, TaskExecutionChange, TaskExecutionChanges)
 
 
 class TaskExecutionDB(Base):
@@ -17,10 +35,259 @@ class TaskExecutionDB(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     execution_date = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        # get_task_executions_by_user and per-user date ranges; INCLUDE makes them index-only scans on Postgres
+        Index("ix_task_executions_user_id_execution_date", "user_id", "execution_date",
+              postgresql_include=["id", "task_id"]),
+        Index("ix_task_executions_execution_date", "execution_date"),
+    )
+
     def __repr__(self):
         return f'TaskExecution {self.id}'
 
 
+class TaskExecutionChangeDB(Base):
+    # Written by a trigger on task_executions (Postgres only), so bulk and raw SQL writes are captured as well.
+    # Deleted rows stay here as tombstones, hence no foreign key.
+    __tablename__ = 'task_execution_changes'
+    seq = Column(BigInteger, primary_key=True)
+    txid = Column(BigInteger, nullable=False)
+    task_execution_id = Column(Integer, nullable=False)
+    op = Column(String(6), nullable=False)
+    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_task_execution_changes_txid_seq", "txid", "seq"),
+    )
+
+
+CHANGES_CHANNEL = "task_execution_changes"
+
+event.listen(TaskExecutionDB.__table__, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION log_task_execution_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_execution_changes (txid, task_execution_id, op)
+    VALUES (pg_current_xact_id()::text::bigint, CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, lower(TG_OP));
+    PERFORM pg_notify('{CHANGES_CHANNEL}', '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""").execute_if(dialect="postgresql"))
+event.listen(TaskExecutionDB.__table__, "after_create", DDL(
+    "CREATE TRIGGER log_task_execution_change AFTER INSERT OR UPDATE OR DELETE ON task_executions "
+    "FOR EACH ROW EXECUTE FUNCTION log_task_execution_change()").execute_if(dialect="postgresql"))
+event.listen(TaskExecutionDB.__table__, "after_drop", DDL(
+    "DROP FUNCTION IF EXISTS log_task_execution_change()").execute_if(dialect="postgresql"))
+
+# Per-day, per-user completion counts for large histories; refreshed by refresh_completion_stats (Postgres only).
+daily_completions = table("daily_completions", column("day", DateTime), column("user_id", Integer),
+                          column("completions", Integer))
+
+event.listen(TaskExecutionDB.__table__, "after_create", DDL(
+    "CREATE MATERIALIZED VIEW daily_completions AS "
+    "SELECT date_trunc('day', execution_date) AS day, user_id, count(*) AS completions "
+    "FROM task_executions GROUP BY 1, 2").execute_if(dialect="postgresql"))
+event.listen(TaskExecutionDB.__table__, "after_create", DDL(
+    "CREATE UNIQUE INDEX ix_daily_completions_day_user_id ON daily_completions (day, user_id)"
+).execute_if(dialect="postgresql"))
+event.listen(TaskExecutionDB.__table__, "before_drop", DDL(
+    "DROP MATERIALIZED VIEW IF EXISTS daily_completions").execute_if(dialect="postgresql"))
+
+_task_execution = row_builder(TaskExecution)
+_task_completions = row_builder(TaskCompletions)
+_user_completions = row_builder(UserCompletions)
+
+Period = Literal["day", "week"]
+
+
+def _select_task_executions() -> Select:
+    return select_schema(TaskExecution, TaskExecutionDB)
+
+
+ExportFormat = Literal["numpy", "arrow"]
+
+# Fixed-width columns: 20 bytes a row as a NumPy structured array, against ~1 KB for a TaskExecution.
+_EXPORT_FIELDS = [("id", "i4"), ("task_id", "i4"), ("user_id", "i4"), ("execution_date", "M8[us]")]
+
+
+def _export_rows() -> Select:
+    return select(*(getattr(TaskExecutionDB, name) for name, _ in _EXPORT_FIELDS)).order_by(TaskExecutionDB.id)
+
+
+def _export_copy_chunk(after_id: int | None, limit: int) -> Select:
+    # Binary COPY has no fixed width for NULL; -infinity decodes to NaT instead.
+    execution_date = func.coalesce(TaskExecutionDB.execution_date, literal_column("'-infinity'::timestamp"))
+    query = select(TaskExecutionDB.id, TaskExecutionDB.task_id, TaskExecutionDB.user_id, execution_date)
+    return keyset_page(query, TaskExecutionDB.id, after_id, limit)
+
+
+def _copies(session: Session) -> bool:
+    bind = session.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver in ("psycopg2", "asyncpg")
+
+
+def _export_chunks(session: Session, chunk_size: int) -> Iterator[Any]:
+    # On PostgreSQL (psycopg2 or asyncpg) every chunk is one binary COPY of the next id range, all within one
+    # REPEATABLE READ snapshot; other drivers stream a server-side cursor.
+    if not _copies(session):
+        for rows in session.execute(_export_rows().execution_options(yield_per=chunk_size)).partitions():
+            yield from_rows(rows, _EXPORT_FIELDS)
+        return
+    connection = session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    after_id = None
+    while True:
+        output = io.BytesIO()
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(copy_binary_sql(_export_copy_chunk(after_id, chunk_size), connection.dialect), output)
+        chunk = decode_copy_binary(output.getvalue(), _EXPORT_FIELDS)
+        if len(chunk):
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after_id = int(chunk["id"][-1])
+
+
+async def _export_chunks_async(session: AsyncSession, chunk_size: int) -> AsyncIterator[Any]:
+    # _export_chunks with asyncpg's copy_from_query.
+    if not _copies(session.sync_session):
+        result = await session.stream(_export_rows().execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield from_rows(rows, _EXPORT_FIELDS)
+        return
+    connection = await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    after_id = None
+    while True:
+        output = io.BytesIO()
+        query = literal_sql(_export_copy_chunk(after_id, chunk_size), connection.dialect)
+        await driver_connection.copy_from_query(query, output=output, format="binary")
+        chunk = decode_copy_binary(output.getvalue(), _EXPORT_FIELDS)
+        if len(chunk):
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after_id = int(chunk["id"][-1])
+
+
+def _check_export_format(format: ExportFormat):
+    if format not in ("numpy", "arrow"):
+        raise ValueError(f"Unknown export format {format}")
+
+
+def _delete_task_execution(session: Session, key: Column, value: int):
+    # key is id or task_id, both unique, so RETURNING yields at most one row.
+    if session.scalar(delete(TaskExecutionDB).where(key == value).returning(TaskExecutionDB.id)) is None:
+        raise TaskExecutionNotFound(value)
+
+
+def _bucket(session: Session, date, period: Period):
+    if period not in ("day", "week"):
+        raise ValueError(f"Unsupported period {period}")
+    if session.get_bind().dialect.name == "sqlite":
+        # Weeks start on Monday, as with Postgres date_trunc.
+        return func.datetime(date, "start of day", *(["weekday 0", "-6 days"] if period == "week" else []))
+    # Inlined, as a bound parameter would make the GROUP BY expression differ from the selected one.
+    return func.date_trunc(literal_column(f"'{period}'"), date)
+
+
+def _get_completions_per_task(session: Session) -> list[TaskCompletions]:
+    rows = session.execute(select(tasks_table.c.id, func.count(TaskExecutionDB.id))
+                           .outerjoin(TaskExecutionDB, TaskExecutionDB.task_id == tasks_table.c.id)
+                           .group_by(tasks_table.c.id)
+                           .order_by(tasks_table.c.id))
+    return [_task_completions(row) for row in rows]
+
+
+def _get_completions_per_user(session: Session, from_view: bool = False) -> list[UserCompletions]:
+    if from_view:
+        per_user = select(daily_completions.c.user_id, func.sum(daily_completions.c.completions).label("completions")) \
+            .group_by(daily_completions.c.user_id).subquery()
+    else:
+        per_user = select(TaskExecutionDB.user_id, func.count().label("completions")) \
+            .group_by(TaskExecutionDB.user_id).subquery()
+    catalogue = select(func.count()).select_from(tasks_table).scalar_subquery()
+    completions = cast(func.coalesce(per_user.c.completions, 0), Integer)
+    percentage = func.coalesce(cast(completions, Float) * 100 / func.nullif(catalogue, 0), 0.0)
+    rows = session.execute(select(UserDB.id, completions, percentage)
+                           .outerjoin(per_user, per_user.c.user_id == UserDB.id)
+                           .order_by(UserDB.id))
+    return [_user_completions(row) for row in rows]
+
+
+def _get_completions_per_period(session: Session, period: Period, since: datetime.datetime | None = None,
+                                until: datetime.datetime | None = None,
+                                from_view: bool = False) -> list[PeriodCompletions]:
+    # The view only holds whole days, so with from_view since/until effectively apply to the day of the execution.
+    if from_view:
+        date, completions = daily_completions.c.day, func.sum(daily_completions.c.completions)
+    else:
+        date, completions = TaskExecutionDB.execution_date, func.count()
+    bucket = _bucket(session, date, period)
+    query = select(bucket, cast(completions, Integer)).group_by(bucket).order_by(bucket)
+    if since is not None:
+        query = query.where(date >= since)
+    if until is not None:
+        query = query.where(date < until)
+    return [PeriodCompletions(period=period_start, completions=count) for period_start, count in session.execute(query)]
+
+
+def _get_time_to_complete(session: Session, task_id: int | None = None) -> TimeToComplete:
+    seconds = func.extract("epoch", TaskExecutionDB.execution_date - UserDB.created_at)
+    query = select(func.count(), func.min(seconds),
+                   func.percentile_cont(literal_column("ARRAY[0.5, 0.9, 0.99]")).within_group(seconds),
+                   func.max(seconds)) \
+        .select_from(TaskExecutionDB).join(UserDB, UserDB.id == TaskExecutionDB.user_id)
+    if task_id is not None:
+        query = query.where(TaskExecutionDB.task_id == task_id)
+    count, minimum, percentiles, maximum = session.execute(query).one()
+    p50, p90, p99 = percentiles or (None, None, None)
+    return TimeToComplete(count=count, min=minimum, p50=p50, p90=p90, p99=p99, max=maximum)
+
+
+def _parse_cursor(cursor: str | None) -> tuple[int, int]:
+    if cursor is None:
+        return 0, 0
+    try:
+        txid, seq = cursor.split(":")
+        return int(txid), int(seq)
+    except ValueError:
+        raise InvalidChangeCursor(cursor) from None
+
+
+# Sequence numbers are assigned before commit, so a change may become visible after later ones. Changes are therefore
+# ordered by transaction id and only read once every transaction up to theirs has finished (the snapshot xmin).
+_snapshot_xmin = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def _get_change_cursor(session: Session) -> str:
+    return f"{session.execute(select(_snapshot_xmin)).scalar_one()}:0"
+
+
+def _get_task_executions_since(session: Session, cursor: str | None, limit: int) -> TaskExecutionChanges:
+    txid, seq = _parse_cursor(cursor)
+    change = TaskExecutionChangeDB
+    rows = session.execute(
+        _select_task_executions()
+        .add_columns(change.txid, change.seq, change.task_execution_id, change.op)
+        .select_from(change)
+        .outerjoin(TaskExecutionDB, TaskExecutionDB.id == change.task_execution_id)
+        .where(tuple_(change.txid, change.seq) > tuple_(txid, seq), change.txid < _snapshot_xmin)
+        .order_by(change.txid, change.seq)
+        .limit(limit))
+    changes = []
+    for row in rows:
+        task_execution = _task_execution(row[:4]) if row.op != "delete" and row.id is not None else None
+        changes.append(TaskExecutionChange.construct(id=row.task_execution_id, op=row.op,
+                                                     task_execution=task_execution))
+        txid, seq = row.txid, row.seq
+    return TaskExecutionChanges.construct(changes=changes, cursor=f"{txid}:{seq}")
+
+
+def _refresh_completion_stats(concurrently: bool):
+    # CONCURRENTLY keeps the view readable during the refresh, using its unique (day, user_id) index.
+    return text(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}daily_completions")
+
+
+@instrument_methods
 class TaskExecutionDAO:
     def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)]):
         self.Session = session_factory
@@ -35,13 +302,38 @@ class TaskExecutionDAO:
 
     def get_task_executions_by_user(self, user_id: int) -> list[TaskExecution]:
         with self.Session() as session:
-            tasks_execution = session.query(TaskExecutionDB).filter(TaskExecutionDB.user_id == user_id).all()
-            return [TaskExecution.from_orm(task_execution) for task_execution in tasks_execution]
+            tasks_execution = session.execute(_select_task_executions().where(TaskExecutionDB.user_id == user_id))
+            return [_task_execution(task_execution) for task_execution in tasks_execution]
 
     def get_all_task_executions(self):
         with self.Session() as session:
-            task_executions = session.query(TaskExecutionDB).all()
-            return [TaskExecution.from_orm(task_execution) for task_execution in task_executions]
+            task_executions = session.execute(_select_task_executions())
+            return [_task_execution(task_execution) for task_execution in task_executions]
+
+    def get_task_executions_page(self, after_id: int | None = None, limit: int = 100) -> list[TaskExecution]:
+        with self.Session() as session:
+            task_executions = session.execute(
+                keyset_page(_select_task_executions(), TaskExecutionDB.id, after_id, limit))
+            return [_task_execution(task_execution) for task_execution in task_executions]
+
+    def iter_task_executions(self, batch_size: int = 1000) -> Iterator[TaskExecution]:
+        with self.Session() as session:
+            task_executions = session.execute(
+                _select_task_executions().order_by(TaskExecutionDB.id).execution_options(yield_per=batch_size))
+            for task_execution in task_executions:
+                yield _task_execution(task_execution)
+
+    def export_task_executions(self, format: ExportFormat = "numpy", chunk_size: int = 1_000_000) -> Iterator[Any]:
+        # Chunks of up to chunk_size rows in id order as NumPy structured arrays or Arrow RecordBatches with
+        # id, task_id, user_id and execution_date (NaT or null when missing).
+        _check_export_format(format)
+        schema = arrow_schema(_EXPORT_FIELDS) if format == "arrow" else None
+        with self.Session() as session:
+            for chunk in _export_chunks(session, chunk_size):
+                yield chunk if schema is None else to_record_batch(chunk, schema)
+
+    def export_task_executions_parquet(self, path: str, chunk_size: int = 1_000_000) -> int:
+        return write_parquet(self.export_task_executions("arrow", chunk_size), path, arrow_schema(_EXPORT_FIELDS))
 
     def add_task_execution(self, task_execution: CreateTaskExecution):
         try:
@@ -52,21 +344,178 @@ class TaskExecutionDAO:
         except IntegrityError as e:
             raise TaskAlreadyDone(task_execution.task_id) from e
 
+    def add_task_executions_bulk(self, task_executions: Iterable[CreateTaskExecution], upsert: bool = False,
+                                 batch_size: int = 1000) -> BulkInsertResult:
+        rows = ({"task_id": task_execution.task_id, "user_id": task_execution.user_id}
+                for task_execution in task_executions)
+        return bulk_insert(self.Session, TaskExecutionDB.__table__, rows, key="task_id",
+                           update_columns=["user_id"] if upsert else None, batch_size=batch_size)
+
     def delete_task_execution(self, id: int):
         with self.Session() as session, session.begin():
-            task_execution = session.get(TaskExecutionDB,id)
-            if task_execution is None:
-                raise TaskExecutionNotFound(id)
-            session.delete(task_execution)
-            session.commit()
+            _delete_task_execution(session, TaskExecutionDB.id, id)
 
     def delete_task_execution_by_task_id(self, task_id: int):
         with self.Session() as session, session.begin():
-            task_execution = session.query(TaskExecutionDB).filter(TaskExecutionDB.task_id == task_id).first()
+            _delete_task_execution(session, TaskExecutionDB.task_id, task_id)
+
+    def get_completions_per_task(self) -> list[TaskCompletions]:
+        with self.Session() as session:
+            return _get_completions_per_task(session)
+
+    def get_completions_per_user(self, from_view: bool = False) -> list[UserCompletions]:
+        with self.Session() as session:
+            return _get_completions_per_user(session, from_view)
+
+    def get_completions_per_period(self, period: Period = "day", since: datetime.datetime | None = None,
+                                   until: datetime.datetime | None = None,
+                                   from_view: bool = False) -> list[PeriodCompletions]:
+        with self.Session() as session:
+            return _get_completions_per_period(session, period, since, until, from_view)
+
+    def get_time_to_complete(self, task_id: int | None = None) -> TimeToComplete:
+        with self.Session() as session:
+            return _get_time_to_complete(session, task_id)
+
+    def refresh_completion_stats(self, concurrently: bool = True):
+        with self.Session() as session, session.begin():
+            session.execute(_refresh_completion_stats(concurrently))
+
+    # The change feed stays on the primary: cursors from replicas at different replay positions could go backwards.
+    def get_change_cursor(self) -> str:
+        with use_primary(self.Session()) as session:
+            return _get_change_cursor(session)
+
+    def get_task_executions_since(self, cursor: str | None = None, limit: int = 1000) -> TaskExecutionChanges:
+        with use_primary(self.Session()) as session:
+            return _get_task_executions_since(session, cursor, limit)
+
+
+@instrument_methods
+class AsyncTaskExecutionDAO:
+    def __init__(self, session_factory: Annotated[async_sessionmaker, Depends(get_async_session_factory)]):
+        self.Session = session_factory
+
+    async def get_task_execution_by_id(self, id: int) -> TaskExecution | None:
+        async with self.Session() as session:
+            task_execution = await session.get(TaskExecutionDB, id)
             if task_execution is None:
-                raise TaskExecutionNotFound(task_id)
-            session.delete(task_execution)
-            session.commit()
+                return None
+            return TaskExecution.from_orm(task_execution)
+
+    async def get_task_executions_by_user(self, user_id: int) -> list[TaskExecution]:
+        async with self.Session() as session:
+            tasks_execution = await session.execute(
+                _select_task_executions().where(TaskExecutionDB.user_id == user_id))
+            return [_task_execution(task_execution) for task_execution in tasks_execution]
+
+    async def get_all_task_executions(self) -> list[TaskExecution]:
+        async with self.Session() as session:
+            task_executions = await session.execute(_select_task_executions())
+            return [_task_execution(task_execution) for task_execution in task_executions]
+
+    async def get_task_executions_page(self, after_id: int | None = None,
+                                       limit: int = 100) -> list[TaskExecution]:
+        async with self.Session() as session:
+            task_executions = await session.execute(
+                keyset_page(_select_task_executions(), TaskExecutionDB.id, after_id, limit))
+            return [_task_execution(task_execution) for task_execution in task_executions]
+
+    async def iter_task_executions(self, batch_size: int = 1000) -> AsyncIterator[TaskExecution]:
+        async with self.Session() as session:
+            task_executions = await session.stream(
+                _select_task_executions().order_by(TaskExecutionDB.id).execution_options(yield_per=batch_size))
+            async for task_execution in task_executions:
+                yield _task_execution(task_execution)
+
+    async def export_task_executions(self, format: ExportFormat = "numpy",
+                                     chunk_size: int = 1_000_000) -> AsyncIterator[Any]:
+        _check_export_format(format)
+        schema = arrow_schema(_EXPORT_FIELDS) if format == "arrow" else None
+        async with self.Session() as session:
+            async for chunk in _export_chunks_async(session, chunk_size):
+                yield chunk if schema is None else to_record_batch(chunk, schema)
+
+    async def add_task_execution(self, task_execution: CreateTaskExecution):
+        try:
+            async with self.Session() as session, session.begin():
+                session.add(TaskExecutionDB(user_id=task_execution.user_id, task_id=task_execution.task_id))
+        except IntegrityError as e:
+            raise TaskAlreadyDone(task_execution.task_id) from e
+
+    async def add_task_executions_bulk(self, task_executions: Iterable[CreateTaskExecution], upsert: bool = False,
+                                       batch_size: int = 1000) -> BulkInsertResult:
+        rows = ({"task_id": task_execution.task_id, "user_id": task_execution.user_id}
+                for task_execution in task_executions)
+        return await bulk_insert_async(self.Session, TaskExecutionDB.__table__, rows, key="task_id",
+                                       update_columns=["user_id"] if upsert else None, batch_size=batch_size)
+
+    async def delete_task_execution(self, id: int):
+        async with self.Session() as session, session.begin():
+            await session.run_sync(_delete_task_execution, TaskExecutionDB.id, id)
+
+    async def delete_task_execution_by_task_id(self, task_id: int):
+        async with self.Session() as session, session.begin():
+            await session.run_sync(_delete_task_execution, TaskExecutionDB.task_id, task_id)
+
+    async def get_completions_per_task(self) -> list[TaskCompletions]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_completions_per_task)
+
+    async def get_completions_per_user(self, from_view: bool = False) -> list[UserCompletions]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_completions_per_user, from_view)
+
+    async def get_completions_per_period(self, period: Period = "day", since: datetime.datetime | None = None,
+                                         until: datetime.datetime | None = None,
+                                         from_view: bool = False) -> list[PeriodCompletions]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_completions_per_period, period, since, until, from_view)
+
+    async def get_time_to_complete(self, task_id: int | None = None) -> TimeToComplete:
+        async with self.Session() as session:
+            return await session.run_sync(_get_time_to_complete, task_id)
+
+    async def refresh_completion_stats(self, concurrently: bool = True):
+        async with self.Session() as session, session.begin():
+            await session.execute(_refresh_completion_stats(concurrently))
+
+    async def get_change_cursor(self) -> str:
+        async with use_primary(self.Session()) as session:
+            return await session.run_sync(_get_change_cursor)
+
+    async def get_task_executions_since(self, cursor: str | None = None, limit: int = 1000) -> TaskExecutionChanges:
+        async with use_primary(self.Session()) as session:
+            return await session.run_sync(_get_task_executions_since, cursor, limit)
+
+    async def watch_task_executions(self, cursor: str | None = None, limit: int = 1000,
+                                    poll_interval: float = 5.0) -> AsyncIterator[TaskExecutionChanges]:
+        # Yields each non-empty batch of changes after cursor, forever. With asyncpg it wakes up on the trigger's
+        # NOTIFY; poll_interval bounds the wait otherwise and when a change is not yet visible.
+        async with use_primary(self.Session()) as session:
+            connection = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            driver_connection = (await connection.get_raw_connection()).driver_connection
+            wakeup = asyncio.Event()
+
+            def notified(*args):
+                wakeup.set()
+
+            listens = hasattr(driver_connection, "add_listener")
+            if listens:
+                await driver_connection.add_listener(CHANGES_CHANNEL, notified)
+            try:
+                while True:
+                    wakeup.clear()
+                    changes = await session.run_sync(_get_task_executions_since, cursor, limit)
+                    cursor = changes.cursor
+                    if changes.changes:
+                        yield changes
+                    if len(changes.changes) < limit:
+                        with suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(wakeup.wait(), poll_interval)
+            finally:
+                if listens:
+                    await driver_connection.remove_listener(CHANGES_CHANNEL, notified)
 
 
 class TaskAlreadyDone(Exception):
@@ -80,3 +529,9 @@ class TaskExecutionNotFound(Exception):
         self.id = id
         self.task_id = task_id
         super().__init__(f"Task execution with id {id} and task_id {task_id} not found")
+
+
+class InvalidChangeCursor(Exception):
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__(f"Invalid change feed cursor {cursor!r}")
@@ -0,0 +1,140 @@
+import heapq
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+class TaskGraph:
+    # In-memory index of the task_prerequisites DAG. An edge task -> prerequisite means the prerequisite
+    # must be done before the task. The index is process-local: writes made through TaskDAO patch it,
+    # writes from elsewhere need invalidate().
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._prerequisites: dict[int, set[int]] | None = None
+        self._dependants: dict[int, set[int]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._prerequisites is not None
+
+    def load(self, session: Session):
+        from .tasks_db import TaskDB, task_prerequisites
+
+        task_ids = session.scalars(select(TaskDB.id)).all()
+        edges = session.execute(select(task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id)).all()
+        self.build(task_ids, edges)
+
+    @contextmanager
+    def reading(self, session: Session) -> Iterator["TaskGraph"]:
+        # Holds the lock from the load through the caller's reads, so an invalidate() from another thread can't
+        # empty the graph between a membership check and a closure.
+        with self._lock:
+            if self._prerequisites is None:
+                self.load(session)
+            yield self
+
+    def build(self, task_ids: Iterable[int], edges: Iterable[tuple[int, int]]):
+        prerequisites = {task_id: set() for task_id in task_ids}
+        dependants = {task_id: set() for task_id in prerequisites}
+        for task_id, prerequisite_id in edges:
+            prerequisites.setdefault(task_id, set()).add(prerequisite_id)
+            dependants.setdefault(task_id, set())
+            prerequisites.setdefault(prerequisite_id, set())
+            dependants.setdefault(prerequisite_id, set()).add(task_id)
+        with self._lock:
+            self._prerequisites = prerequisites
+            self._dependants = dependants
+
+    def invalidate(self):
+        with self._lock:
+            self._prerequisites = None
+            self._dependants = {}
+
+    def __contains__(self, task_id: int) -> bool:
+        with self._lock:
+            return self._prerequisites is not None and task_id in self._prerequisites
+
+    def add_task(self, task_id: int):
+        with self._lock:
+            if self._prerequisites is None:
+                return
+            self._prerequisites.setdefault(task_id, set())
+            self._dependants.setdefault(task_id, set())
+
+    def set_prerequisites(self, task_id: int, prerequisite_ids: Iterable[int]):
+        with self._lock:
+            if self._prerequisites is None:
+                return
+            self.add_task(task_id)
+            for prerequisite_id in self._prerequisites[task_id]:
+                self._dependants[prerequisite_id].discard(task_id)
+            self._prerequisites[task_id] = set(prerequisite_ids)
+            for prerequisite_id in self._prerequisites[task_id]:
+                self.add_task(prerequisite_id)
+                self._dependants[prerequisite_id].add(task_id)
+
+    def ancestors(self, task_id: int) -> set[int]:
+        # Everything that has to be done before task_id.
+        with self._lock:
+            return self._closure(task_id, self._prerequisites)
+
+    def descendants(self, task_id: int) -> set[int]:
+        # Everything that (transitively) waits for task_id.
+        with self._lock:
+            return self._closure(task_id, self._dependants)
+
+    def topological_order(self) -> list[int]:
+        # Prerequisites come before the tasks that need them, ties broken by id.
+        with self._lock:
+            order = self._order()
+            if len(order) != len(self._prerequisites):
+                raise ValueError("task_prerequisites contains a cycle")
+            return order
+
+    def find_cycle(self) -> list[int] | None:
+        # One cycle as [task, its prerequisite, ...], or None for a DAG. Every task left out of the topological
+        # order has a prerequisite that is left out too, so following those must come back around.
+        with self._lock:
+            ordered = set(self._order())
+            if len(ordered) == len(self._prerequisites):
+                return None
+            task_id = min(task_id for task_id in self._prerequisites if task_id not in ordered)
+            path, seen = [], {}
+            while task_id not in seen:
+                seen[task_id] = len(path)
+                path.append(task_id)
+                task_id = min(self._prerequisites[task_id] - ordered)
+            return path[seen[task_id]:]
+
+    def _order(self) -> list[int]:
+        remaining = {task_id: len(prerequisites) for task_id, prerequisites in self._prerequisites.items()}
+        ready = [task_id for task_id, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            task_id = heapq.heappop(ready)
+            order.append(task_id)
+            for dependant_id in self._dependants[task_id]:
+                remaining[dependant_id] -= 1
+                if remaining[dependant_id] == 0:
+                    heapq.heappush(ready, dependant_id)
+        return order
+
+    def _closure(self, task_id: int, adjacency: dict[int, set[int]]) -> set[int]:
+        seen = set()
+        stack = list(adjacency[task_id])
+        while stack:
+            current = stack.pop()
+            if current not in seen:
+                seen.add(current)
+                stack.extend(adjacency[current])
+        return seen
+
+
+@lru_cache
+def get_task_graph() -> TaskGraph:
+    return TaskGraph()
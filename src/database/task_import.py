@@ -0,0 +1,240 @@
+"""Imports a task catalogue from CSV or JSONL.
+
+    python -m src.database.task_import tasks.csv --batch-size 1000
+
+CSV needs a name column and may have description and prerequisites columns, with prerequisite names separated
+by ";". JSONL has one {"name": ..., "description": ..., "prerequisites": [...]} object per line.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from typing import Annotated, Literal
+
+from fastapi import Depends
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ._bulk import batched, insert_batch
+from ._db import SessionLocal, get_session_factory
+from ._routing import use_primary
+from .instrumentation import instrument_methods
+from .task_graph import TaskGraph, get_task_graph
+from .tasks_db import TaskDB, lock_prerequisites, task_prerequisites
+from .unit_of_work import outside_unit_of_work
+from ..schemas.task_import import ImportProgress, ImportTask, TaskImportResult
+
+Format = Literal["csv", "jsonl"]
+
+_PREREQUISITE_SEPARATOR = ";"
+
+
+def _parse(line: int, data: dict) -> ImportTask:
+    try:
+        task = ImportTask.parse_obj(data)
+    except ValidationError as e:
+        raise TaskImportError(line, str(e)) from e
+    for column in (TaskDB.name, TaskDB.description):
+        if len(getattr(task, column.key)) > column.type.length:
+            raise TaskImportError(line, f"{column.key} is longer than {column.type.length} characters")
+    return task
+
+
+def read_tasks(lines: Iterable[str], format: Format) -> Iterator[tuple[int, ImportTask]]:
+    # Yields (line number, task); CSV files should be opened with newline="".
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            prerequisites = (row.get("prerequisites") or "").split(_PREREQUISITE_SEPARATOR)
+            yield reader.line_num, _parse(reader.line_num, {
+                "name": row.get("name"), "description": row.get("description") or "",
+                "prerequisites": [name.strip() for name in prerequisites if name.strip()]})
+    elif format == "jsonl":
+        for line, text in enumerate(lines, start=1):
+            if text.strip():
+                try:
+                    data = json.loads(text)
+                except json.JSONDecodeError as e:
+                    raise TaskImportError(line, str(e)) from e
+                yield line, _parse(line, data)
+    else:
+        raise ValueError(f"Unknown import format {format}")
+
+
+def _hashed(lines: Iterable[str], digest) -> Iterator[str]:
+    for line in lines:
+        digest.update(line.encode())
+        yield line
+
+
+def _resolve(session: Session, tasks: dict[str, tuple[int, ImportTask]]) -> dict[str, int]:
+    # Maps every name the file uses to the id of the existing task, in one scan of the tasks table. Unknown
+    # prerequisites and cycles are reported before anything is written: the file's tasks get provisional
+    # (negative) ids, replace the prerequisites of existing tasks of the same name and join the stored DAG.
+    referenced = set(tasks) | {name for _, task in tasks.values() for name in task.prerequisites}
+    existing = {name: id for id, name in session.execute(select(TaskDB.id, TaskDB.name)) if name in referenced}
+    for line, task in tasks.values():
+        for name in task.prerequisites:
+            if name not in tasks and name not in existing:
+                raise TaskImportError(line, f"Unknown prerequisite {name}")
+
+    ids = dict(existing)
+    ids.update((name, -provisional) for provisional, name in enumerate(
+        (name for name in tasks if name not in existing), start=1))
+    replaced = {ids[name] for name in tasks}
+    edges = [(task_id, prerequisite_id) for task_id, prerequisite_id in session.execute(
+        select(task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id)) if task_id not in replaced]
+    edges += [(ids[name], ids[prerequisite])
+              for name, (_, task) in tasks.items() for prerequisite in task.prerequisites]
+    _check_cycles(session, ids, edges)
+    return existing
+
+
+def _check_cycles(session: Session, ids: dict[str, int], edges: Iterable[tuple[int, int]]):
+    graph = TaskGraph()
+    graph.build(ids.values(), edges)
+    if cycle := graph.find_cycle():
+        names = {id: name for name, id in ids.items()}
+        unnamed = [id for id in cycle if id not in names]
+        if unnamed:
+            names.update((id, name) for id, name in session.execute(
+                select(TaskDB.id, TaskDB.name).where(TaskDB.id.in_(unnamed))))
+        raise TaskImportCycle([names[id] for id in cycle])
+
+
+def _read_checkpoint(path: str | None, digest: str, batch_size: int) -> dict:
+    # A checkpoint only applies to the same input split into the same batches.
+    state = {"digest": digest, "batch_size": batch_size, "tasks": 0}
+    if path is not None and os.path.exists(path):
+        with open(path) as file:
+            saved = json.load(file)
+        if saved.get("digest") == digest and saved.get("batch_size") == batch_size:
+            state.update(saved)
+    return state
+
+
+def _write_checkpoint(path: str | None, state: dict):
+    if path is not None:
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(state, file)
+        os.replace(f"{path}.tmp", path)
+
+
+@instrument_methods
+class TaskImporter:
+    def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)],
+                 graph: Annotated[TaskGraph, Depends(get_task_graph)] = None):
+        # Every batch commits on its own and is recorded in the checkpoint, so an import never joins a unit of work
+        # whose rollback would undo batches the checkpoint already counts as done.
+        self.Session = outside_unit_of_work(session_factory)
+        self.graph = graph if graph is not None else TaskGraph()
+
+    def import_tasks(self, lines: Iterable[str], format: Format, batch_size: int = 1000,
+                     checkpoint: str | None = None,
+                     progress: Callable[[ImportProgress], None] | None = None) -> TaskImportResult:
+        # Upserts the tasks one transaction per batch, then replaces the prerequisites of every imported task in a
+        # single transaction, so the committed edges are never a mix of the old and the new catalogue. The
+        # completed task batches are recorded in the checkpoint file, so a rerun after a failure skips them; the
+        # file is removed once the import is done.
+        digest = hashlib.sha256()
+        tasks: dict[str, tuple[int, ImportTask]] = {}
+        for line, task in read_tasks(_hashed(lines, digest), format):
+            if task.name in tasks:
+                raise TaskImportError(line, f"Task {task.name} is already defined on line {tasks[task.name][0]}")
+            tasks[task.name] = (line, task)
+        with self.Session() as session:
+            ids = _resolve(use_primary(session), tasks)
+
+        state = _read_checkpoint(checkpoint, digest.hexdigest(), batch_size)
+        result = TaskImportResult()
+        task_batches = list(batched(tasks, batch_size))
+        try:
+            for number, names in enumerate(task_batches):
+                if number < state["tasks"]:
+                    result.resumed_batches += 1
+                else:
+                    self._write_tasks(names, tasks, ids, result)
+                    state["tasks"] = number + 1
+                    _write_checkpoint(checkpoint, state)
+                if progress is not None:
+                    progress(ImportProgress(phase="tasks", done=min((number + 1) * batch_size, len(tasks)),
+                                            total=len(tasks)))
+            self._resolve_written(tasks, ids)
+            self._write_prerequisites(tasks, ids, batch_size, result)
+            if progress is not None:
+                progress(ImportProgress(phase="prerequisites", done=len(tasks), total=len(tasks)))
+        finally:
+            # Too many tasks and edges change to patch the graph one by one.
+            self.graph.invalidate()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return result
+
+    def _write_tasks(self, names: list[str], tasks: dict[str, tuple[int, ImportTask]], ids: dict[str, int],
+                     result: TaskImportResult):
+        rows = [{"name": name, "description": tasks[name][1].description} for name in names]
+        with self.Session() as session, session.begin():
+            written = insert_batch(session, TaskDB.__table__, rows, "name", ["description"])
+        ids.update((name, id) for id, name in written)
+        result.tasks += len(written)
+
+    def _resolve_written(self, tasks: dict[str, tuple[int, ImportTask]], ids: dict[str, int]):
+        # Tasks written by an earlier run of a resumed import.
+        missing = [name for name in tasks if name not in ids]
+        with self.Session() as session:
+            for names in batched(missing, 1000):
+                ids.update((name, id) for id, name in use_primary(session).execute(
+                    select(TaskDB.id, TaskDB.name).where(TaskDB.name.in_(names))))
+
+    def _write_prerequisites(self, tasks: dict[str, tuple[int, ImportTask]], ids: dict[str, int], batch_size: int,
+                             result: TaskImportResult):
+        # Other writers may have added edges since _resolve, so the cycle check is repeated under the lock before
+        # the transaction commits.
+        rows = [{"task_id": ids[name], "prerequisite_id": ids[prerequisite]}
+                for name, (_, task) in tasks.items() for prerequisite in dict.fromkeys(task.prerequisites)]
+        with self.Session() as session, session.begin():
+            lock_prerequisites(session)
+            for names in batched(tasks, batch_size):
+                session.execute(delete(task_prerequisites).where(
+                    task_prerequisites.c.task_id.in_([ids[name] for name in names])))
+            for batch in batched(rows, batch_size):
+                session.execute(insert(task_prerequisites), batch)
+            _check_cycles(session, ids, session.execute(
+                select(task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id)))
+        result.prerequisites += len(rows)
+
+
+class TaskImportError(Exception):
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f"Line {line}: {message}")
+
+
+class TaskImportCycle(Exception):
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"Prerequisites form a cycle: {' -> '.join(names + names[:1])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", help="defaults to <path>.checkpoint")
+    args = parser.parse_args()
+
+    def report(progress: ImportProgress):
+        print(f"{progress.phase}: {progress.done}/{progress.total}", file=sys.stderr)
+
+    try:
+        with open(args.path, newline="") as source:
+            print(TaskImporter(session_factory=SessionLocal).import_tasks(
+                source, args.format or os.path.splitext(args.path)[1].lstrip(".").lower(), args.batch_size,
+                args.checkpoint or f"{args.path}.checkpoint", report).json())
+    except (TaskImportError, TaskImportCycle) as e:
+        sys.exit(str(e))
@@ -1,11 +1,25 @@
+from collections.abc import Iterable, Iterator, AsyncIterator
+from functools import partial
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Table, Select, select, exists, delete, func, insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, Session
 
-from ._db import Base, get_session_factory
+from ._bulk import bulk_insert, bulk_insert_async
+from ._db import Base, get_session_factory, get_async_session_factory
+from ._routing import use_primary
+from ._rows import update_by_id
+from ._search import autocomplete, fts5_fallback, prefix_index, search_ids, search_index
+from ._streaming import keyset_page
+from .instrumentation import instrument_methods
+from .tag_db import TagDB, TagNotFound, task_tags
+from .task_execution_db import TaskExecutionDB
+from .task_graph import TaskGraph, get_task_graph
+from .unit_of_work import after_commit, outside_unit_of_work
+from ..schemas.bulk import BulkInsertResult
 from ..schemas.tasks import Task, CreateTask
 
 task_prerequisites = Table(
@@ -13,6 +27,8 @@ task_prerequisites = Table(
     Base.metadata,
     Column("task_id", Integer, ForeignKey("tasks.id"), primary_key=True),
     Column("prerequisite_id", Integer, ForeignKey("tasks.id"), primary_key=True),
+    # The primary key only serves lookups by task_id; this one serves get_tasks_by_prerequisite and descendants.
+    Index("ix_task_prerequisites_prerequisite_id_task_id", "prerequisite_id", "task_id"),
 )
 
 
@@ -29,65 +45,350 @@ class TaskDB(Base):
         backref="tasks",
     )
 
+    __table_args__ = (
+        search_index("ix_tasks_search", name, description),
+        prefix_index("ix_tasks_name_prefix", name),
+    )
+
     def __repr__(self):
         return f'Task {self.name}'
 
 
+fts5_fallback(TaskDB.__table__, "name", "description")
+
+# pg_advisory_xact_lock key held by transactions that change task_prerequisites.
+_PREREQUISITES_LOCK = 0x7461736b
+
+
+def _load_tasks(session: Session, roots: Select | None = None) -> list[Task]:
+    # Fetches the task rows and the task_prerequisites adjacency in bulk and links the recursive
+    # Task models in memory, so the number of queries doesn't depend on the depth or size of the DAG.
+    tasks_query = select(TaskDB.id, TaskDB.name, TaskDB.description).order_by(TaskDB.id)
+    edges_query = select(task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id).order_by(
+        task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id)
+    root_ids = None
+    if roots is not None:
+        root_ids = session.scalars(roots).all()
+        if not root_ids:
+            return []
+        closure = select(TaskDB.id).where(TaskDB.id.in_(root_ids)).cte("closure", recursive=True)
+        closure = closure.union(
+            select(task_prerequisites.c.prerequisite_id).join(closure, task_prerequisites.c.task_id == closure.c.id))
+        tasks_query = tasks_query.where(TaskDB.id.in_(select(closure.c.id)))
+        edges_query = edges_query.where(task_prerequisites.c.task_id.in_(select(closure.c.id)))
+
+    tasks = {row.id: Task.construct(id=row.id, name=row.name, description=row.description, prerequisite_tasks=[])
+             for row in session.execute(tasks_query)}
+    for task_id, prerequisite_id in session.execute(edges_query):
+        tasks[task_id].prerequisite_tasks.append(tasks[prerequisite_id])
+    if root_ids is None:
+        return list(tasks.values())
+    return [tasks[id] for id in root_ids]
+
+
+def _get_task_by_id(session: Session, id: int) -> Task | None:
+    tasks = _load_tasks(session, select(TaskDB.id).where(TaskDB.id == id))
+    return tasks[0] if tasks else None
+
+
+def _get_task_by_name(session: Session, name: str) -> Task | None:
+    tasks = _load_tasks(session, select(TaskDB.id).where(TaskDB.name == name))
+    return tasks[0] if tasks else None
+
+
+def _get_tasks_by_prerequisite(session: Session, id: int) -> list[Task]:
+    return _load_tasks(session, select(task_prerequisites.c.task_id)
+                       .where(task_prerequisites.c.prerequisite_id == id)
+                       .order_by(task_prerequisites.c.task_id))
+
+
+def _get_tasks_page(session: Session, after_id: int | None, limit: int) -> list[Task]:
+    return _load_tasks(session, keyset_page(select(TaskDB.id), TaskDB.id, after_id, limit))
+
+
+def _get_available_tasks(session: Session, user_id: int) -> list[Task]:
+    # Tasks the user hasn't executed and whose prerequisites they all have, as one anti-join.
+    def executed(task_id):
+        return exists().where(TaskExecutionDB.task_id == task_id, TaskExecutionDB.user_id == user_id)
+
+    missing_prerequisite = exists().where(task_prerequisites.c.task_id == TaskDB.id,
+                                          ~executed(task_prerequisites.c.prerequisite_id))
+    return _load_tasks(session, select(TaskDB.id)
+                       .where(~executed(TaskDB.id), ~missing_prerequisite)
+                       .order_by(TaskDB.id))
+
+
+def _get_tasks_by_tags(session: Session, tag_ids: Iterable[int], match_all: bool, after_id: int | None,
+                       limit: int) -> list[Task]:
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return []
+    task_ids = select(task_tags.c.task_id).where(task_tags.c.tag_id.in_(tag_ids)).group_by(task_tags.c.task_id)
+    if match_all:
+        task_ids = task_ids.having(func.count() == len(tag_ids))
+    return _load_tasks(session, keyset_page(task_ids, task_tags.c.task_id, after_id, limit))
+
+
+def _search_tasks(session: Session, query: str, limit: int, offset: int) -> list[Task]:
+    ids = search_ids(session, TaskDB.__table__, [TaskDB.name, TaskDB.description], query, limit, offset)
+    return [] if ids is None else _load_tasks(session, ids)
+
+
+def _autocomplete_tasks(session: Session, prefix: str, limit: int) -> list[str]:
+    return session.scalars(autocomplete(TaskDB.name, prefix, limit)).all()
+
+
+def _set_task_tags(session: Session, id: int, tag_ids: Iterable[int]):
+    if session.get(TaskDB, id) is None:
+        raise TaskNotFound(id)
+    tag_ids = set(tag_ids)
+    missing = tag_ids - set(session.scalars(select(TagDB.id).where(TagDB.id.in_(tag_ids))))
+    if missing:
+        raise TagNotFound(min(missing))
+    session.execute(delete(task_tags).where(task_tags.c.task_id == id))
+    if tag_ids:
+        session.execute(insert(task_tags), [{"task_id": id, "tag_id": tag_id} for tag_id in tag_ids])
+
+
+def _graph_closure(session: Session, graph: TaskGraph, id: int, dependants: bool = False) -> set[int]:
+    # Loaded from the primary: the graph is only patched afterwards, so a lagging snapshot would stick. DAOs pass
+    # a session outside any unit of work, since the graph is shared by every request and patched on commit.
+    with graph.reading(use_primary(session)):
+        if id not in graph:
+            raise TaskNotFound(id)
+        return graph.descendants(id) if dependants else graph.ancestors(id)
+
+
+def _topological_order(session: Session, graph: TaskGraph) -> list[int]:
+    with graph.reading(use_primary(session)):
+        return graph.topological_order()
+
+
+def lock_prerequisites(session: Session):
+    # Serialises transactions that change task_prerequisites until they end, so a cycle check and the edges it
+    # approved commit together. SQLite already allows a single writer.
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(select(func.pg_advisory_xact_lock(_PREREQUISITES_LOCK)))
+
+
+def _creates_cycle(session: Session, id: int, prerequisite_ids: list[int]) -> bool:
+    # Checked against the committed edges rather than the TaskGraph, which may lag behind other processes.
+    if id in prerequisite_ids:
+        return True
+    if not prerequisite_ids:
+        return False
+    ancestors = select(TaskDB.id).where(TaskDB.id.in_(prerequisite_ids)).cte("ancestors", recursive=True)
+    ancestors = ancestors.union(
+        select(task_prerequisites.c.prerequisite_id).join(ancestors, task_prerequisites.c.task_id == ancestors.c.id))
+    return session.scalar(select(exists().where(ancestors.c.id == id)))
+
+
+def _modify_task(session: Session, id: int, **kwargs):
+    values = {key: value for key, value in kwargs.items() if key != "prerequisite_tasks"}
+    if update_by_id(session, TaskDB, id, values, [TaskDB.id]) is None:
+        raise TaskNotFound(id)
+    if "prerequisite_tasks" in kwargs:
+        prerequisite_ids = list(dict.fromkeys(task.id for task in kwargs["prerequisite_tasks"]))
+        lock_prerequisites(session)
+        if _creates_cycle(session, id, prerequisite_ids):
+            raise TaskPrerequisiteCycle(id, prerequisite_ids)
+        session.execute(delete(task_prerequisites).where(task_prerequisites.c.task_id == id))
+        if prerequisite_ids:
+            session.execute(insert(task_prerequisites).values(
+                [{"task_id": id, "prerequisite_id": prerequisite_id} for prerequisite_id in prerequisite_ids]))
+
+
+@instrument_methods
 class TaskDAO:
-    def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)]):
+    def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)],
+                 graph: Annotated[TaskGraph, Depends(get_task_graph)] = None):
         self.Session = session_factory
+        self.graph = graph if graph is not None else TaskGraph()
 
     def get_task_by_id(self, id: int) -> Task | None:
         with self.Session() as session:
-            taskdb = session.get(TaskDB,id)
-            if not taskdb:
-                return None
-            task = Task.from_orm(taskdb)
-        return task
+            return _get_task_by_id(session, id)
 
     def get_task_by_name(self, name: str) -> Task | None:
         with self.Session() as session:
-            taskdb = session.query(TaskDB).filter(TaskDB.name == name).first()
-            if not taskdb:
-                return None
-            task = Task.from_orm(taskdb)
-        return task
+            return _get_task_by_name(session, name)
 
     def get_all_tasks(self) -> list[Task]:
         with self.Session() as session:
-            tasks = session.query(TaskDB).all()
-            return [Task.from_orm(task) for task in tasks]
+            return _load_tasks(session)
+
+    def get_tasks_page(self, after_id: int | None = None, limit: int = 100) -> list[Task]:
+        with self.Session() as session:
+            return _get_tasks_page(session, after_id, limit)
+
+    def iter_tasks(self, batch_size: int = 1000) -> Iterator[Task]:
+        # Walks keyset pages so each batch only materialises its own prerequisite closure.
+        after_id = None
+        while tasks := self.get_tasks_page(after_id, batch_size):
+            yield from tasks
+            after_id = tasks[-1].id
 
     def get_tasks_by_prerequisite(self, id: int) -> list[Task] | None:
         with self.Session() as session:
-            tasks = session.query(TaskDB).filter(TaskDB.prerequisite_tasks.any(id=id)).all()
-            return [Task.from_orm(task) for task in tasks]
+            return _get_tasks_by_prerequisite(session, id)
+
+    def get_available_tasks(self, user_id: int) -> list[Task]:
+        with self.Session() as session:
+            return _get_available_tasks(session, user_id)
+
+    def get_tasks_by_tags(self, tag_ids: Iterable[int], match_all: bool = False, after_id: int | None = None,
+                          limit: int = 100) -> list[Task]:
+        with self.Session() as session:
+            return _get_tasks_by_tags(session, tag_ids, match_all, after_id, limit)
+
+    def set_task_tags(self, id: int, tag_ids: Iterable[int]):
+        with self.Session() as session, session.begin():
+            _set_task_tags(session, id, tag_ids)
+
+    def search_tasks(self, query: str, limit: int = 20, offset: int = 0) -> list[Task]:
+        with self.Session() as session:
+            return _search_tasks(session, query, limit, offset)
+
+    def autocomplete_tasks(self, prefix: str, limit: int = 10) -> list[str]:
+        with self.Session() as session:
+            return _autocomplete_tasks(session, prefix, limit)
 
     def add_task(self, task: CreateTask):
         try:
             with self.Session() as session, session.begin():
                 taskdb = TaskDB(name=task.name, description=task.description)
                 session.add(taskdb)
+                session.flush()
+                task_id = taskdb.id
                 session.commit()
         except IntegrityError as e:
             raise TaskAlreadyExists(task_name=task.name) from e
+        after_commit(self.Session, partial(self.graph.add_task, task_id))
+
+    def add_tasks_bulk(self, tasks: Iterable[CreateTask], upsert: bool = False,
+                       batch_size: int = 1000) -> BulkInsertResult:
+        rows = ({"name": task.name, "description": task.description} for task in tasks)
+        result = bulk_insert(self.Session, TaskDB.__table__, rows, key="name",
+                             update_columns=["description"] if upsert else None, batch_size=batch_size)
+        for task_id in result.ids:
+            after_commit(self.Session, partial(self.graph.add_task, task_id))
+        return result
 
     def modify_task(self, id: int, *args, **kwargs):
         with self.Session() as session, session.begin():
-            taskdb = session.get(TaskDB,id)
-            if not taskdb:
-                raise TaskNotFound(id)
-            for key, value in kwargs.items():
-                if hasattr(taskdb, key):
-                    if key == "prerequisite_tasks":
-                        taskdb.prerequisite_tasks = []
-                        for prerequisite_task in value:
-                            taskdb.prerequisite_tasks.append(session.get(TaskDB,prerequisite_task.id))
-                    else:
-                        setattr(taskdb, key, value)
-                else:
-                    raise AttributeError(f"TaskDB has no attribute {key}")
+            _modify_task(session, id, **kwargs)
             session.commit()
+        if "prerequisite_tasks" in kwargs:
+            after_commit(self.Session, partial(self.graph.set_prerequisites, id,
+                                               [task.id for task in kwargs["prerequisite_tasks"]]))
+
+    def get_task_ancestors(self, id: int) -> set[int]:
+        with outside_unit_of_work(self.Session)() as session:
+            return _graph_closure(session, self.graph, id)
+
+    def get_task_descendants(self, id: int) -> set[int]:
+        with outside_unit_of_work(self.Session)() as session:
+            return _graph_closure(session, self.graph, id, dependants=True)
+
+    def get_topological_order(self) -> list[int]:
+        with outside_unit_of_work(self.Session)() as session:
+            return _topological_order(session, self.graph)
+
+
+@instrument_methods
+class AsyncTaskDAO:
+    # Reads and modify_task reuse TaskDAO's Session-level helpers through run_sync.
+    def __init__(self, session_factory: Annotated[async_sessionmaker, Depends(get_async_session_factory)],
+                 graph: Annotated[TaskGraph, Depends(get_task_graph)] = None):
+        self.Session = session_factory
+        self.graph = graph if graph is not None else TaskGraph()
+
+    async def get_task_by_id(self, id: int) -> Task | None:
+        async with self.Session() as session:
+            return await session.run_sync(_get_task_by_id, id)
+
+    async def get_task_by_name(self, name: str) -> Task | None:
+        async with self.Session() as session:
+            return await session.run_sync(_get_task_by_name, name)
+
+    async def get_all_tasks(self) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_load_tasks)
+
+    async def get_tasks_page(self, after_id: int | None = None, limit: int = 100) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_tasks_page, after_id, limit)
+
+    async def iter_tasks(self, batch_size: int = 1000) -> AsyncIterator[Task]:
+        after_id = None
+        while tasks := await self.get_tasks_page(after_id, batch_size):
+            for task in tasks:
+                yield task
+            after_id = tasks[-1].id
+
+    async def get_tasks_by_prerequisite(self, id: int) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_tasks_by_prerequisite, id)
+
+    async def get_available_tasks(self, user_id: int) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_available_tasks, user_id)
+
+    async def get_tasks_by_tags(self, tag_ids: Iterable[int], match_all: bool = False, after_id: int | None = None,
+                                limit: int = 100) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_get_tasks_by_tags, tag_ids, match_all, after_id, limit)
+
+    async def set_task_tags(self, id: int, tag_ids: Iterable[int]):
+        async with self.Session() as session, session.begin():
+            await session.run_sync(_set_task_tags, id, tag_ids)
+
+    async def search_tasks(self, query: str, limit: int = 20, offset: int = 0) -> list[Task]:
+        async with self.Session() as session:
+            return await session.run_sync(_search_tasks, query, limit, offset)
+
+    async def autocomplete_tasks(self, prefix: str, limit: int = 10) -> list[str]:
+        async with self.Session() as session:
+            return await session.run_sync(_autocomplete_tasks, prefix, limit)
+
+    async def add_task(self, task: CreateTask):
+        try:
+            async with self.Session() as session, session.begin():
+                taskdb = TaskDB(name=task.name, description=task.description)
+                session.add(taskdb)
+                await session.flush()
+                task_id = taskdb.id
+        except IntegrityError as e:
+            raise TaskAlreadyExists(task_name=task.name) from e
+        after_commit(self.Session, partial(self.graph.add_task, task_id))
+
+    async def add_tasks_bulk(self, tasks: Iterable[CreateTask], upsert: bool = False,
+                             batch_size: int = 1000) -> BulkInsertResult:
+        rows = ({"name": task.name, "description": task.description} for task in tasks)
+        result = await bulk_insert_async(self.Session, TaskDB.__table__, rows, key="name",
+                                         update_columns=["description"] if upsert else None, batch_size=batch_size)
+        for task_id in result.ids:
+            after_commit(self.Session, partial(self.graph.add_task, task_id))
+        return result
+
+    async def modify_task(self, id: int, *args, **kwargs):
+        async with self.Session() as session, session.begin():
+            await session.run_sync(_modify_task, id, **kwargs)
+        if "prerequisite_tasks" in kwargs:
+            after_commit(self.Session, partial(self.graph.set_prerequisites, id,
+                                               [task.id for task in kwargs["prerequisite_tasks"]]))
+
+    async def get_task_ancestors(self, id: int) -> set[int]:
+        async with outside_unit_of_work(self.Session)() as session:
+            return await session.run_sync(_graph_closure, self.graph, id)
+
+    async def get_task_descendants(self, id: int) -> set[int]:
+        async with outside_unit_of_work(self.Session)() as session:
+            return await session.run_sync(_graph_closure, self.graph, id, dependants=True)
+
+    async def get_topological_order(self) -> list[int]:
+        async with outside_unit_of_work(self.Session)() as session:
+            return await session.run_sync(_topological_order, self.graph)
 
 
 class TaskAlreadyExists(Exception):
@@ -100,3 +401,10 @@ class TaskNotFound(Exception):
     def __init__(self, id):
         self.id = id
         super().__init__(f"Task with id {id} not found")
+
+
+class TaskPrerequisiteCycle(Exception):
+    def __init__(self, id, prerequisite_ids):
+        self.id = id
+        self.prerequisite_ids = prerequisite_ids
+        super().__init__(f"Prerequisites {prerequisite_ids} of task with id {id} would create a cycle")
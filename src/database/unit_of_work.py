@@ -0,0 +1,134 @@
+from collections.abc import AsyncIterator, Callable, Iterator
+
+from fastapi import Depends
+from sqlalchemy import Connection, Transaction
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, AsyncTransaction, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from ._db import get_async_session_factory, get_session_factory
+
+
+class _UnitOfWorkHooks:
+    def __init__(self):
+        # dicts rather than lists so a DAO registering the same callback on every call runs it once.
+        self._after_commit: dict[Callable[[], None], None] = {}
+        self._after_rollback: dict[Callable[[], None], None] = {}
+
+    def after_commit(self, callback: Callable[[], None]):
+        self._after_commit[callback] = None
+
+    def after_rollback(self, callback: Callable[[], None]):
+        self._after_rollback[callback] = None
+
+    def _finished(self, committed: bool):
+        callbacks = self._after_commit if committed else self._after_rollback
+        self._after_commit, self._after_rollback = {}, {}
+        for callback in callbacks:
+            callback()
+
+
+class UnitOfWork(_UnitOfWorkHooks):
+    # Stands in for a sessionmaker: every Session it makes joins one connection and one transaction, so DAOs
+    # built on it share both. A DAO's own commit only flushes; nothing is committed until commit(), and
+    # whatever is left uncommitted is rolled back on exit. A failed write dooms the whole unit of work.
+    def __init__(self, session_factory: sessionmaker):
+        super().__init__()
+        self._session_factory = session_factory
+        self._connection: Connection | None = None
+        self._transaction: Transaction | None = None
+
+    def __enter__(self) -> "UnitOfWork":
+        self._connection = self._session_factory.kw["bind"].connect()
+        self._transaction = self._connection.begin()
+        return self
+
+    def __call__(self, **kwargs) -> Session:
+        return self._session_factory(bind=self._connection, join_transaction_mode="rollback_only", **kwargs)
+
+    def commit(self):
+        self._transaction.commit()
+        self._finished(committed=True)
+        self._transaction = self._connection.begin()
+
+    def __exit__(self, *exc_info):
+        try:
+            self._connection.close()
+        finally:
+            self._finished(committed=False)
+
+
+class AsyncUnitOfWork(_UnitOfWorkHooks):
+    def __init__(self, session_factory: async_sessionmaker):
+        super().__init__()
+        self._session_factory = session_factory
+        self._connection: AsyncConnection | None = None
+        self._transaction: AsyncTransaction | None = None
+
+    async def __aenter__(self) -> "AsyncUnitOfWork":
+        self._connection = await self._session_factory.kw["bind"].connect()
+        self._transaction = await self._connection.begin()
+        return self
+
+    def __call__(self, **kwargs) -> AsyncSession:
+        return self._session_factory(bind=self._connection, join_transaction_mode="rollback_only", **kwargs)
+
+    async def commit(self):
+        await self._transaction.commit()
+        self._finished(committed=True)
+        self._transaction = await self._connection.begin()
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self._connection.close()
+        finally:
+            self._finished(committed=False)
+
+
+SessionFactory = sessionmaker | async_sessionmaker | UnitOfWork | AsyncUnitOfWork
+
+
+def outside_unit_of_work(session_factory: SessionFactory) -> sessionmaker | async_sessionmaker:
+    # The factory a unit of work wraps, for reads that are shared beyond it and so must only see committed rows,
+    # and for writes that have to commit on their own.
+    if isinstance(session_factory, (UnitOfWork, AsyncUnitOfWork)):
+        return session_factory._session_factory
+    return session_factory
+
+
+def after_commit(session_factory: SessionFactory, callback: Callable[[], None]):
+    # For state shared with other requests: plain session factories have committed already, a unit of work
+    # runs callback only if and when it commits.
+    if isinstance(session_factory, _UnitOfWorkHooks):
+        session_factory.after_commit(callback)
+    else:
+        callback()
+
+
+def after_transaction(session_factory: SessionFactory, callback: Callable[[], None]):
+    # Runs callback again once the unit of work has committed or rolled back.
+    if isinstance(session_factory, _UnitOfWorkHooks):
+        session_factory.after_commit(callback)
+        session_factory.after_rollback(callback)
+
+
+# FastAPI runs the teardown of these after the response has been sent, so endpoints call commit() themselves;
+# the teardown only rolls back what was left uncommitted. They call the session factories directly so that
+# get_session_factory can be overridden with join_unit_of_work without a dependency cycle.
+def get_unit_of_work() -> Iterator[UnitOfWork]:
+    with UnitOfWork(get_session_factory()) as unit_of_work:
+        yield unit_of_work
+
+
+async def get_async_unit_of_work() -> AsyncIterator[AsyncUnitOfWork]:
+    async with AsyncUnitOfWork(get_async_session_factory()) as unit_of_work:
+        yield unit_of_work
+
+
+# app.dependency_overrides[get_session_factory] = join_unit_of_work (and the async twin) makes every DAO of a request
+# join the request's unit of work, since FastAPI resolves get_unit_of_work once per request.
+def join_unit_of_work(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> UnitOfWork:
+    return unit_of_work
+
+
+def join_async_unit_of_work(unit_of_work: AsyncUnitOfWork = Depends(get_async_unit_of_work)) -> AsyncUnitOfWork:
+    return unit_of_work
@@ -0,0 +1,212 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Annotated, Any, Callable
+
+from fastapi import Depends
+from sqlalchemy.orm import sessionmaker
+
+from src.config import get_settings
+from src.schemas.bulk import BulkInsertResult
+from src.schemas.users import UserInDB, SafeUserCreate
+from ._db import get_session_factory
+from .instrumentation import instrument_methods
+from .unit_of_work import after_transaction
+from ._routing import use_primary
+from .user_db import UserDAO, _get_user_by_id, _get_user_by_username
+
+
+class UserCache(ABC):
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> UserInDB | None:
+        user = self._get(key)
+        with self._stats_lock:
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return user
+
+    @abstractmethod
+    def set(self, key: str, user: UserInDB):
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        pass
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def _get(self, key: str) -> UserInDB | None:
+        pass
+
+
+class InMemoryUserCache(UserCache):
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, UserInDB]] = OrderedDict()
+
+    def _get(self, key: str) -> UserInDB | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key: str, user: UserInDB):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return super().stats() | {"size": len(self._entries)}
+
+
+class SharedUserCache(UserCache):
+    # Backed by any client with the redis-py get/set(ex=)/delete interface, shared between processes.
+    def __init__(self, client: Any, ttl: float = 60, prefix: str = "checklist:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _get(self, key: str) -> UserInDB | None:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return UserInDB.parse_raw(value)
+
+    def set(self, key: str, user: UserInDB):
+        self.client.set(self.prefix + key, user.json(), ex=max(1, round(self.ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+
+def _redis_client(url: str) -> Any:
+    try:
+        import redis
+    except ImportError as e:
+        raise ImportError("The shared user cache needs redis: pip install redis") from e
+    return redis.Redis.from_url(url)
+
+
+@lru_cache
+def get_user_cache() -> UserCache | None:
+    settings = get_settings()
+    if settings.user_cache_backend == "none":
+        return None
+    if settings.user_cache_backend == "shared":
+        return SharedUserCache(_redis_client(settings.user_cache_url), ttl=settings.user_cache_ttl)
+    return InMemoryUserCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+
+def _id_key(id: int) -> str:
+    return f"user:id:{id}"
+
+
+def _username_key(username: str) -> str:
+    return f"user:username:{username}"
+
+
+@instrument_methods
+class CachedUserDAO(UserDAO):
+    def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)],
+                 cache: Annotated[UserCache, Depends(get_user_cache)]):
+        super().__init__(session_factory)
+        self.cache = cache
+
+    def get_user_by_id(self, id: int) -> UserInDB | None:
+        user = self.cache.get(_id_key(id))
+        if user is None:
+            user = self._read(_get_user_by_id, id)
+            self._store(user)
+        return user
+
+    def get_user_by_username(self, username: str) -> UserInDB | None:
+        user = self.cache.get(_username_key(username))
+        if user is None:
+            user = self._read(_get_user_by_username, username)
+            self._store(user)
+        return user
+
+    def add_users_bulk(self, users: Iterable[SafeUserCreate], upsert: bool = False,
+                       batch_size: int = 1000) -> BulkInsertResult:
+        users = list(users)
+        result = super().add_users_bulk(users, upsert=upsert, batch_size=batch_size)
+        if upsert:
+            self._delete(*(_id_key(id) for id in result.ids), *(_username_key(user.username) for user in users))
+        return result
+
+    def modify_user(self, id: int, *args, **kwargs) -> UserInDB:
+        # The returned row names the current username key; only a rename needs the old one read up front.
+        previous = self._read(_get_user_by_id, id) if "username" in kwargs else None
+        user = None
+        try:
+            user = super().modify_user(id, *args, **kwargs)
+            return user
+        finally:
+            self._invalidate(id, previous, user)
+
+    def delete_user(self, id: int) -> UserInDB:
+        user = None
+        try:
+            user = super().delete_user(id)
+            return user
+        finally:
+            self._invalidate(id, user)
+
+    def _read(self, get: Callable, key: int | str) -> UserInDB | None:
+        # From the primary: a lagging replica could hand back a row invalidated moments ago, which would then be
+        # served for the whole ttl.
+        with use_primary(self.Session()) as session:
+            return get(session, key)
+
+    def _store(self, user: UserInDB | None):
+        if user is not None:
+            self.cache.set(_id_key(user.id), user)
+            self.cache.set(_username_key(user.username), user)
+
+    def _invalidate(self, id: int, *users: UserInDB | None):
+        self._delete(_id_key(id), *(_username_key(user.username) for user in users if user is not None))
+
+    def _delete(self, *keys: str):
+        # Inside a unit of work, reads may cache the uncommitted row again before the transaction ends.
+        self.cache.delete(*keys)
+        after_transaction(self.Session, lambda: self.cache.delete(*keys))
+
+
+def get_user_dao(session_factory: sessionmaker = Depends(get_session_factory),
+                 cache: UserCache | None = Depends(get_user_cache)) -> UserDAO:
+    # The UserDAO for request dependencies such as JwtConverter, cached unless USER_CACHE_BACKEND=none.
+    if cache is None:
+        return UserDAO(session_factory)
+    return CachedUserDAO(session_factory, cache)
@@ -1,13 +1,21 @@
 import datetime
+from collections.abc import Iterable, Iterator, AsyncIterator
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, delete, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 
-from src.schemas.users import UserInDB, SafeUserCreate
-from ._db import Base, get_session_factory
+from src.schemas.bulk import BulkInsertResult
+from src.schemas.users import User, UserInDB, SafeUserCreate
+from ._bulk import bulk_insert, bulk_insert_async
+from ._db import Base, get_session_factory, get_async_session_factory
+from ._rows import row_builder, schema_columns, select_schema, update_by_id
+from ._search import autocomplete, fts5_fallback, prefix_index, search_ids, search_index
+from ._streaming import keyset_page
+from .instrumentation import instrument_methods
 
 
 class UserDB(Base):
@@ -20,34 +28,101 @@ class UserDB(Base):
     is_superuser = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        search_index("ix_users_search", username, name, surname),
+        prefix_index("ix_users_username_prefix", username),
+    )
+
     def __repr__(self):
         return f'User {self.username}'
 
 
+fts5_fallback(UserDB.__table__, "username", "name", "surname")
+
+_user = row_builder(UserInDB)
+# Pages, searches and streams of users return User, so they can't leak the password hashes.
+_public_user = row_builder(User)
+
+
+def _get_user_by_id(session: Session, id: int) -> UserInDB | None:
+    userdb: UserDB = session.query(UserDB).filter(UserDB.id == id).first()
+    if userdb is None:
+        return None
+    return UserInDB.from_orm(userdb)
+
+
+def _get_user_by_username(session: Session, username: str) -> UserInDB | None:
+    userdb: UserDB = session.query(UserDB).filter(UserDB.username == username).first()
+    if userdb is None:
+        return None
+    return UserInDB.from_orm(userdb)
+
+
+def _search_users(session: Session, query: str, limit: int, offset: int) -> list[User]:
+    ids = search_ids(session, UserDB.__table__, [UserDB.username, UserDB.name, UserDB.surname], query, limit, offset)
+    if ids is None:
+        return []
+    ids = session.scalars(ids).all()
+    users = {user.id: user for user in map(_public_user, session.execute(
+        select_schema(User, UserDB).where(UserDB.id.in_(ids))))}
+    return [users[id] for id in ids]
+
+
+def _autocomplete_users(session: Session, prefix: str, limit: int) -> list[str]:
+    return session.scalars(autocomplete(UserDB.username, prefix, limit)).all()
+
+
+def _modify_user(session: Session, id: int, **kwargs) -> UserInDB:
+    user = update_by_id(session, UserDB, id, kwargs, schema_columns(UserInDB, UserDB))
+    if user is None:
+        raise UserNotFound(id)
+    return _user(user)
+
+
+def _delete_user(session: Session, id: int) -> UserInDB:
+    user = session.execute(delete(UserDB).where(UserDB.id == id).returning(*schema_columns(UserInDB, UserDB))).first()
+    if user is None:
+        raise UserNotFound(id)
+    return _user(user)
+
+
+@instrument_methods
 class UserDAO:
     def __init__(self, session_factory: Annotated[sessionmaker, Depends(get_session_factory)]):
         self.Session = session_factory
 
     def get_user_by_id(self, id: int) -> UserInDB | None:
         with self.Session() as session:
-            userdb: UserDB = session.query(UserDB).filter(UserDB.id == id).first()
-            if userdb is None:
-                return None
-            user = UserInDB.from_orm(userdb)
-            return user
+            return _get_user_by_id(session, id)
 
     def get_user_by_username(self, username: str) -> UserInDB | None:
         with self.Session() as session:
-            userdb: UserDB = session.query(UserDB).filter(UserDB.username == username).first()
-            if userdb is None:
-                return None
-            user = UserInDB.from_orm(userdb)
-            return user
+            return _get_user_by_username(session, username)
 
     def get_all_users(self) -> list[UserInDB]:
         with self.Session() as session:
-            users = session.query(UserDB).all()
-            return [UserInDB.from_orm(user) for user in users]
+            users = session.execute(select_schema(UserInDB, UserDB))
+            return [_user(user) for user in users]
+
+    def get_users_page(self, after_id: int | None = None, limit: int = 100) -> list[User]:
+        with self.Session() as session:
+            users = session.execute(keyset_page(select_schema(User, UserDB), UserDB.id, after_id, limit))
+            return [_public_user(user) for user in users]
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        with self.Session() as session:
+            users = session.execute(select_schema(User, UserDB).order_by(UserDB.id)
+                                    .execution_options(yield_per=batch_size))
+            for user in users:
+                yield _public_user(user)
+
+    def search_users(self, query: str, limit: int = 20, offset: int = 0) -> list[User]:
+        with self.Session() as session:
+            return _search_users(session, query, limit, offset)
+
+    def autocomplete_users(self, prefix: str, limit: int = 10) -> list[str]:
+        with self.Session() as session:
+            return _autocomplete_users(session, prefix, limit)
 
     def add_user(self, user: SafeUserCreate):
         try:
@@ -59,25 +134,89 @@ class UserDAO:
         except IntegrityError as e:
             raise UserAlreadyExists(user.username) from e
 
-    def modify_user(self, id: int, *args, **kwargs):
+    def add_users_bulk(self, users: Iterable[SafeUserCreate], upsert: bool = False,
+                       batch_size: int = 1000) -> BulkInsertResult:
+        rows = (user.dict(include={"username", "name", "surname", "password_hash"}) for user in users)
+        return bulk_insert(self.Session, UserDB.__table__, rows, key="username",
+                           update_columns=["name", "surname", "password_hash"] if upsert else None,
+                           batch_size=batch_size)
+
+    def modify_user(self, id: int, *args, **kwargs) -> UserInDB:
         with self.Session() as session, session.begin():
-            userdb: UserDB = session.query(UserDB).filter(UserDB.id == id).first()
-            if userdb is None:
-                raise UserNotFound(id)
-            for key, value in kwargs.items():
-                if hasattr(userdb, key):
-                    setattr(userdb, key, value)
-                else:
-                    raise AttributeError(f'UserDB has no attribute {key}')
-            session.commit()
-
-    def delete_user(self, id: int):
+            return _modify_user(session, id, **kwargs)
+
+    def delete_user(self, id: int) -> UserInDB:
         with self.Session() as session, session.begin():
-            userdb: UserDB = session.query(UserDB).filter(UserDB.id == id).first()
+            return _delete_user(session, id)
+
+
+@instrument_methods
+class AsyncUserDAO:
+    def __init__(self, session_factory: Annotated[async_sessionmaker, Depends(get_async_session_factory)]):
+        self.Session = session_factory
+
+    async def get_user_by_id(self, id: int) -> UserInDB | None:
+        async with self.Session() as session:
+            userdb: UserDB | None = await session.get(UserDB, id)
+            if userdb is None:
+                return None
+            return UserInDB.from_orm(userdb)
+
+    async def get_user_by_username(self, username: str) -> UserInDB | None:
+        async with self.Session() as session:
+            userdb: UserDB | None = await session.scalar(select(UserDB).filter(UserDB.username == username))
             if userdb is None:
-                raise UserNotFound(id)
-            session.delete(userdb)
-            session.commit()
+                return None
+            return UserInDB.from_orm(userdb)
+
+    async def get_all_users(self) -> list[UserInDB]:
+        async with self.Session() as session:
+            users = await session.execute(select_schema(UserInDB, UserDB))
+            return [_user(user) for user in users]
+
+    async def get_users_page(self, after_id: int | None = None, limit: int = 100) -> list[User]:
+        async with self.Session() as session:
+            users = await session.execute(keyset_page(select_schema(User, UserDB), UserDB.id, after_id, limit))
+            return [_public_user(user) for user in users]
+
+    async def iter_users(self, batch_size: int = 1000) -> AsyncIterator[User]:
+        async with self.Session() as session:
+            users = await session.stream(
+                select_schema(User, UserDB).order_by(UserDB.id).execution_options(yield_per=batch_size))
+            async for user in users:
+                yield _public_user(user)
+
+    async def search_users(self, query: str, limit: int = 20, offset: int = 0) -> list[User]:
+        async with self.Session() as session:
+            return await session.run_sync(_search_users, query, limit, offset)
+
+    async def autocomplete_users(self, prefix: str, limit: int = 10) -> list[str]:
+        async with self.Session() as session:
+            return await session.run_sync(_autocomplete_users, prefix, limit)
+
+    async def add_user(self, user: SafeUserCreate):
+        try:
+            async with self.Session() as session, session.begin():
+                userdb = UserDB(username=user.username, name=user.name, surname=user.surname,
+                                password_hash=user.password_hash)
+                session.add(userdb)
+        except IntegrityError as e:
+            raise UserAlreadyExists(user.username) from e
+
+    async def add_users_bulk(self, users: Iterable[SafeUserCreate], upsert: bool = False,
+                             batch_size: int = 1000) -> BulkInsertResult:
+        rows = (user.dict(include={"username", "name", "surname", "password_hash"}) for user in users)
+        return await bulk_insert_async(self.Session, UserDB.__table__, rows, key="username",
+                                       update_columns=["name", "surname", "password_hash"] if upsert else None,
+                                       batch_size=batch_size)
+
+    async def modify_user(self, id: int, *args, **kwargs) -> UserInDB:
+        async with self.Session() as session, session.begin():
+            return await session.run_sync(_modify_user, id, **kwargs)
+
+    async def delete_user(self, id: int) -> UserInDB:
+        async with self.Session() as session, session.begin():
+            return await session.run_sync(_delete_user, id)
 
 
 class UserAlreadyExists(Exception):
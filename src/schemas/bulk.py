@@ -0,0 +1,8 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class BulkInsertResult(BaseModel):
+    ids: list[int] = []
+    conflicts: list[Any] = []
@@ -10,3 +10,7 @@ class Tag(CreateTag):
 
     class Config:
         orm_mode = True
+
+
+class TagCount(Tag):
+    tasks: int
@@ -1,4 +1,5 @@
 import datetime
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -14,3 +15,42 @@ class TaskExecution(CreateTaskExecution):
 
     class Config:
         orm_mode = True
+
+
+class TaskCompletions(BaseModel):
+    task_id: int
+    completions: int
+
+
+class UserCompletions(BaseModel):
+    user_id: int
+    completions: int
+    completion_percentage: float
+
+
+class PeriodCompletions(BaseModel):
+    period: datetime.datetime
+    completions: int
+
+
+class TimeToComplete(BaseModel):
+    # Seconds between a user's created_at and the execution_date of their completions.
+    count: int
+    min: float | None
+    p50: float | None
+    p90: float | None
+    p99: float | None
+    max: float | None
+
+
+class TaskExecutionChange(BaseModel):
+    id: int
+    op: Literal["insert", "update", "delete"]
+    # Current state of the row; None for deletes and for rows deleted by a later change.
+    task_execution: TaskExecution | None
+
+
+class TaskExecutionChanges(BaseModel):
+    changes: list[TaskExecutionChange]
+    # Opaque; pass it back to get_task_executions_since to continue after these changes.
+    cursor: str
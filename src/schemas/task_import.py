@@ -0,0 +1,24 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+from .tasks import CreateTask
+
+
+class ImportTask(CreateTask):
+    description: str = ""
+    # Names of tasks in the same file or already in the database.
+    prerequisites: list[str] = []
+
+
+class ImportProgress(BaseModel):
+    phase: Literal["tasks", "prerequisites"]
+    done: int
+    total: int
+
+
+class TaskImportResult(BaseModel):
+    tasks: int = 0
+    prerequisites: int = 0
+    # Batches a previous, interrupted run had already written.
+    resumed_batches: int = 0
@@ -18,6 +18,12 @@ class User(UserBase):
         orm_mode = True
 
 
+class Principal(BaseModel):
+    id: int
+    username: str
+    is_superuser: bool
+
+
 class UserInDB(User):
     password_hash: str
 
@@ -2,30 +2,58 @@ from datetime import datetime, timedelta
 from typing import Annotated
 
 from fastapi import Depends
-from jose import jwt
+from jose import jwt, JWTError
 
 import src
-from src.config import get_settings
+from src.config import get_security_settings
+from src.database.user_cache import get_user_dao
 from src.database.user_db import UserDAO
-from src.schemas.users import User
+from src.schemas.users import User, Principal
+from src.security.keyring import KeyRing, get_keyring
+from src.security.revocation import TokenRevocations, get_token_revocations
+from src.security.token_cache import TokenCache, get_token_cache
 
 
 class JwtConverter:
-    def __init__(self, userdao: UserDAO, config: Annotated[src.config.SecuritySetting, Depends(get_settings)]):
+    def __init__(self, userdao: Annotated[UserDAO, Depends(get_user_dao)],
+                 config: Annotated[src.config.SecuritySetting, Depends(get_security_settings)],
+                 revocations: Annotated[TokenRevocations, Depends(get_token_revocations)] = None,
+                 token_cache: Annotated[TokenCache, Depends(get_token_cache)] = None,
+                 keyring: Annotated[KeyRing, Depends(get_keyring)] = None):
         self.dao = userdao
-        self.secret = config.jwt_secret
+        self.stateless = config.jwt_stateless
+        self.revocations = revocations if revocations is not None else get_token_revocations()
+        self.token_cache = token_cache if token_cache is not None else get_token_cache()
+        self.keyring = keyring if keyring is not None else KeyRing.from_settings(config)
 
-    def get_user(self, token: str) -> User | None:
-        decoded = jwt.decode(token, self.secret)
+    def decode(self, token: str) -> dict:
+        key = self.keyring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        decoded = self.token_cache.get(key.fingerprint, token)
+        if decoded is None:
+            decoded = jwt.decode(token, key.verifying_key, algorithms=[key.algorithm])
+            self.token_cache.set(key.fingerprint, token, decoded)
+        return decoded
+
+    def get_user(self, token: str) -> User | Principal | None:
+        decoded = self.decode(token)
+        user_id = decoded.get("user_id")
+        if user_id is not None and self.revocations.is_revoked(user_id, decoded.get("ver", 0)):
+            raise JWTError("Token has been revoked")
+        if self.stateless and user_id is not None:
+            return Principal(id=user_id, username=decoded.get("username"), is_superuser=decoded.get("is_superuser"))
         username = decoded.get("username")
         user = self.dao.get_user_by_username(username=username)
         return User.from_orm(user)
     def get_jwt(self, user: User):
+        key = self.keyring.signing_key()
         claims = {
             "iss": "ska_checklist",
             "iat": datetime.utcnow(),
             "exp": datetime.utcnow() + timedelta(minutes=15),
+            "user_id": user.id,
+            "ver": self.revocations.current_version(user.id),
             "username": user.username,
             "is_superuser": user.is_superuser,
         }
-        return jwt.encode(claims=claims, key=self.secret)
+        headers = {"kid": key.kid} if key.kid is not None else None
+        return jwt.encode(claims=claims, key=key.signing_key, algorithm=key.algorithm, headers=headers)
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+from jose import jwk, JWTError
+from jose.backends.base import Key
+
+from src.config import SecuritySetting, get_security_settings
+from src.security.token_cache import key_fingerprint
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # Naive datetimes are taken to be UTC, as the manifests have always been written.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class JwtKey:
+    def __init__(self, kid: str | None, algorithm: str, verifying_key: Key, signing_key: Key | None = None,
+                 fingerprint: str = "", verify_until: datetime | None = None):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.verifying_key = verifying_key
+        self.signing_key = signing_key
+        self.fingerprint = fingerprint
+        self.verify_until = _as_utc(verify_until)
+
+    @classmethod
+    def from_pem(cls, kid: str, algorithm: str, pem: str, verify_until: datetime | None = None) -> "JwtKey":
+        key = jwk.construct(pem, algorithm)
+        if key.is_public():
+            return cls(kid, algorithm, key, fingerprint=key_fingerprint(pem), verify_until=verify_until)
+        public_key = key.public_key()
+        return cls(kid, algorithm, public_key, signing_key=key, fingerprint=key_fingerprint(public_key.to_pem()),
+                   verify_until=verify_until)
+
+    @classmethod
+    def from_secret(cls, secret: str, algorithm: str = "HS256") -> "JwtKey":
+        key = jwk.construct(secret, algorithm)
+        return cls(None, algorithm, key, signing_key=key, fingerprint=key_fingerprint(secret))
+
+
+class KeyRing:
+    # Keys are parsed once; tokens pick their verifying key by the kid header. Keys with verify_until
+    # are retired ones that still verify during the rotation window but never sign.
+    def __init__(self, keys: list[JwtKey], active_kid: str | None = None):
+        self.keys = {key.kid: key for key in keys}
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_secret(cls, secret: str) -> "KeyRing":
+        return cls([JwtKey.from_secret(secret)])
+
+    @classmethod
+    def from_manifest(cls, path: str | Path) -> "KeyRing":
+        # {"active": "<kid>", "keys": [{"kid": "<kid>", "alg": "RS256", "key": "<kid>.pem",
+        #                               "verify_until": "<iso datetime, optional>"}]}
+        path = Path(path)
+        manifest = json.loads(path.read_text())
+        keys = []
+        for entry in manifest["keys"]:
+            verify_until = entry.get("verify_until")
+            keys.append(JwtKey.from_pem(entry["kid"], entry["alg"], (path.parent / entry["key"]).read_text(),
+                                        datetime.fromisoformat(verify_until) if verify_until else None))
+        return cls(keys, manifest.get("active"))
+
+    @classmethod
+    def from_settings(cls, config: SecuritySetting) -> "KeyRing":
+        if config.jwt_keyring_path:
+            return cls.from_manifest(config.jwt_keyring_path)
+        return cls.from_secret(config.jwt_secret)
+
+    def signing_key(self) -> JwtKey:
+        key = self.keys.get(self.active_kid)
+        if key is None or key.signing_key is None:
+            raise SigningKeyUnavailable(self.active_kid)
+        if key.verify_until is not None:
+            raise SigningKeyUnavailable(self.active_kid, "it is retired")
+        return key
+
+    def verification_key(self, kid: str | None) -> JwtKey:
+        key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key id {kid}")
+        if key.verify_until is not None and key.verify_until <= datetime.now(timezone.utc):
+            raise JWTError(f"Key {kid} is retired")
+        return key
+
+
+@lru_cache
+def get_keyring() -> KeyRing:
+    return KeyRing.from_settings(get_security_settings())
+
+
+class SigningKeyUnavailable(Exception):
+    def __init__(self, kid: str | None, reason: str = "no private key is loaded for it"):
+        self.kid = kid
+        super().__init__(f"Cannot sign with active key id {kid}: {reason}")
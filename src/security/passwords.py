@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from passlib.hash import argon2
+from starlette.concurrency import run_in_threadpool
+
+from src.config import SecuritySetting, get_security_settings
+from src.database.user_db import UserDAO
+from src.schemas.users import UserCreate, SafeUserCreate, UserInDB
+
+
+def _hash(password: str, params: dict) -> str:
+    return argon2.using(**params).hash(password)
+
+
+def _verify(password: str, password_hash: str, params: dict) -> tuple[bool, str | None]:
+    hasher = argon2.using(**params)
+    if not hasher.verify(password, password_hash):
+        return False, None
+    if hasher.needs_update(password_hash):
+        return True, hasher.hash(password)
+    return True, None
+
+
+class PasswordService:
+    # argon2 runs in a process pool so hashing never holds the event loop or the GIL. At most
+    # queue_limit calls may be running or waiting; beyond that callers get a 503 instead of queueing.
+    def __init__(self, time_cost: int = 3, memory_cost: int = 65536, parallelism: int = 4,
+                 workers: int = 2, queue_limit: int = 64, executor: Executor | None = None):
+        self.params = {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism}
+        self.executor = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+        if queue_limit < 1:
+            raise ValueError("queue_limit must be at least 1")
+        self._slots = threading.BoundedSemaphore(queue_limit)
+
+    @classmethod
+    def from_settings(cls, config: SecuritySetting) -> "PasswordService":
+        return cls(time_cost=config.argon2_time_cost, memory_cost=config.argon2_memory_cost,
+                   parallelism=config.argon2_parallelism, workers=config.password_hash_workers,
+                   queue_limit=config.password_hash_queue_limit)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._submit(_hash, password, self.params)
+
+    async def verify_password(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        # Returns whether the password matches and, if the hash used outdated parameters, a new hash.
+        return await self._submit(_verify, password, password_hash, self.params)
+
+    async def create_user(self, user: UserCreate) -> SafeUserCreate:
+        return SafeUserCreate(username=user.username, name=user.name, surname=user.surname,
+                              password_hash=await self.hash_password(user.password))
+
+    async def authenticate(self, userdao: UserDAO, username: str, password: str) -> UserInDB | None:
+        user = await run_in_threadpool(userdao.get_user_by_username, username)
+        if user is None:
+            return None
+        matches, new_hash = await self.verify_password(password, user.password_hash)
+        if not matches:
+            return None
+        if new_hash is not None:
+            await run_in_threadpool(userdao.modify_user, user.id, password_hash=new_hash)
+            user = user.copy(update={"password_hash": new_hash})
+        return user
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    async def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordServiceBusy()
+        try:
+            return await asyncio.wrap_future(self.executor.submit(fn, *args))
+        finally:
+            self._slots.release()
+
+
+@lru_cache
+def get_password_service() -> PasswordService:
+    return PasswordService.from_settings(get_security_settings())
+
+
+class PasswordServiceBusy(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="Password service is busy, retry later", headers={"Retry-After": "1"})
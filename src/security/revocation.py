@@ -0,0 +1,25 @@
+import threading
+from functools import lru_cache
+
+
+class TokenRevocations:
+    # Tokens carry the user's token version; revoking bumps the version so every older token is rejected.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: dict[int, int] = {}
+
+    def current_version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def revoke(self, user_id: int) -> int:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            return self._versions[user_id]
+
+    def is_revoked(self, user_id: int, version: int) -> bool:
+        return version < self._versions.get(user_id, 0)
+
+
+@lru_cache
+def get_token_revocations() -> TokenRevocations:
+    return TokenRevocations()
@@ -0,0 +1,63 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable
+
+
+def key_fingerprint(key: str | bytes) -> str:
+    if isinstance(key, str):
+        key = key.encode()
+    return hashlib.sha256(key).hexdigest()
+
+
+class TokenCache:
+    # Verified claims keyed by a hash of the verifying key and the token, so entries verified with
+    # a rotated-out key can never be hit. Entries live until the token's exp.
+    def __init__(self, maxsize: int = 4096, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: str, token: str) -> dict | None:
+        key = self._key(fingerprint, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def set(self, fingerprint: str, token: str, claims: dict):
+        if "exp" not in claims:
+            return
+        with self._lock:
+            self._entries[self._key(fingerprint, token)] = (float(claims["exp"]), dict(claims))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    @staticmethod
+    def _key(fingerprint: str, token: str) -> str:
+        return hashlib.sha256(f"{fingerprint}:{token}".encode()).hexdigest()
+
+
+@lru_cache
+def get_token_cache() -> TokenCache:
+    return TokenCache()
@@ -0,0 +1,16 @@
+from contextlib import contextmanager
+
+import pytest
+
+from src.database.instrumentation import track
+
+
+@pytest.fixture
+def query_budget():
+    @contextmanager
+    def budget(max_statements: int):
+        with track() as invocation:
+            yield invocation
+        assert invocation.statements <= max_statements, \
+            f"{invocation.statements} statements issued, budget was {max_statements}"
+    return budget
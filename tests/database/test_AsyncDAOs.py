@@ -0,0 +1,226 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.database._db import Base, SessionLocal, engine, _async_db_url
+from src.database._streaming import server_sent_events
+from src.database.tag_db import TagDB, AsyncTagDAO, TagAlreadyExists, TagNotFound
+from src.database.task_execution_db import TaskExecutionDB, AsyncTaskExecutionDAO, TaskAlreadyDone
+from src.database.tasks_db import TaskDB, AsyncTaskDAO, TaskNotFound
+from src.database.user_db import UserDB, AsyncUserDAO, UserAlreadyExists, UserNotFound
+from src.schemas.tags import CreateTag
+from src.schemas.task_executions import CreateTaskExecution
+from src.schemas.tasks import CreateTask, Task
+from src.schemas.users import SafeUserCreate
+
+
+@pytest.fixture
+def prepared_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    task1 = TaskDB(name="test1", description="test1")
+    task2 = TaskDB(name="test2", description="test2", prerequisite_tasks=[task1])
+    task3 = TaskDB(name="test3", description="test3", prerequisite_tasks=[task1, task2])
+    db.add_all([task1, task2, task3])
+    db.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+    db.add(UserDB(username='test2', name="john", surname="smith", password_hash='test'))
+    db.add(TagDB(name="Mechanics"))
+    db.commit()
+    db.add(TaskExecutionDB(task_id=1, user_id=1))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def async_session_factory():
+    # asyncio.run opens a new event loop per call, so connections must not outlive it
+    async_engine = create_async_engine(_async_db_url, poolclass=NullPool)
+    return async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+
+def test_async_get_user_by_username(prepared_db, async_session_factory):
+    userdao = AsyncUserDAO(session_factory=async_session_factory)
+    user = asyncio.run(userdao.get_user_by_username("test"))
+
+    assert user.id == 1
+    assert user.name == "adam"
+    assert asyncio.run(userdao.get_user_by_username("not_test_name")) is None
+
+
+def test_async_add_user_already_in_db(prepared_db, async_session_factory):
+    userdao = AsyncUserDAO(session_factory=async_session_factory)
+    user = SafeUserCreate(username='test', name="adam", surname="Kowalski", password_hash='test')
+    with pytest.raises(UserAlreadyExists):
+        asyncio.run(userdao.add_user(user))
+
+
+def test_async_modify_and_delete_user(prepared_db, async_session_factory):
+    userdao = AsyncUserDAO(session_factory=async_session_factory)
+    asyncio.run(userdao.modify_user(1, name="new_name"))
+
+    assert prepared_db.get(UserDB, 1).name == "new_name"
+
+    with pytest.raises(AttributeError):
+        asyncio.run(userdao.modify_user(1, wrong_parameter="new_surname"))
+
+    asyncio.run(userdao.delete_user(2))
+    prepared_db.expire_all()
+
+    assert prepared_db.get(UserDB, 2) is None
+    with pytest.raises(UserNotFound):
+        asyncio.run(userdao.delete_user(2))
+
+
+def test_async_get_task_with_other_tasks_as_prerequisites(prepared_db, async_session_factory):
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+    task: Task = asyncio.run(taskdao.get_task_by_id(3))
+
+    assert task.name == "test3"
+    assert [prerequisite.name for prerequisite in task.prerequisite_tasks] == ["test1", "test2"]
+    assert task.prerequisite_tasks[1].prerequisite_tasks[0].name == "test1"
+
+
+def test_async_get_all_tasks_and_by_prerequisite(prepared_db, async_session_factory):
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+
+    assert [task.name for task in asyncio.run(taskdao.get_all_tasks())] == ["test1", "test2", "test3"]
+    assert [task.name for task in asyncio.run(taskdao.get_tasks_by_prerequisite(2))] == ["test3"]
+
+
+def test_async_modify_task_prerequisites(prepared_db, async_session_factory):
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+    task = Task(id=1, name="test1", description="test1", prerequisite_tasks=[])
+
+    asyncio.run(taskdao.modify_task(3, prerequisite_tasks=[task]))
+
+    assert [prerequisite.name for prerequisite in prepared_db.get(TaskDB, 3).prerequisite_tasks] == ["test1"]
+    with pytest.raises(TaskNotFound):
+        asyncio.run(taskdao.modify_task(4, name="test4"))
+
+
+def test_async_tags(prepared_db, async_session_factory):
+    tagdao = AsyncTagDAO(session_factory=async_session_factory)
+    asyncio.run(tagdao.add_tag(CreateTag(name="Safety")))
+
+    assert [tag.name for tag in asyncio.run(tagdao.get_all_tags())] == ["Mechanics", "Safety"]
+    assert asyncio.run(tagdao.get_tag_by_name("Safety")).id == 2
+    with pytest.raises(TagAlreadyExists):
+        asyncio.run(tagdao.add_tag(CreateTag(name="Safety")))
+    with pytest.raises(TagNotFound):
+        asyncio.run(tagdao.delete_tag(5))
+
+
+def test_async_task_executions(prepared_db, async_session_factory):
+    task_execution_dao = AsyncTaskExecutionDAO(session_factory=async_session_factory)
+    asyncio.run(task_execution_dao.add_task_execution(CreateTaskExecution(user_id=1, task_id=2)))
+
+    task_executions = asyncio.run(task_execution_dao.get_task_executions_by_user(1))
+    assert [task_execution.task_id for task_execution in task_executions] == [1, 2]
+
+    with pytest.raises(TaskAlreadyDone):
+        asyncio.run(task_execution_dao.add_task_execution(CreateTaskExecution(user_id=1, task_id=2)))
+
+    asyncio.run(task_execution_dao.delete_task_execution_by_task_id(2))
+    assert asyncio.run(task_execution_dao.get_task_execution_by_id(2)) is None
+
+
+def test_async_pages_and_iterators(prepared_db, async_session_factory):
+    userdao = AsyncUserDAO(session_factory=async_session_factory)
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+
+    async def collect(iterator):
+        return [item async for item in iterator]
+
+    assert [user.username for user in asyncio.run(userdao.get_users_page(after_id=1))] == ["test2"]
+    assert [user.username for user in asyncio.run(collect(userdao.iter_users(batch_size=1)))] == ["test", "test2"]
+    assert [task.name for task in asyncio.run(collect(taskdao.iter_tasks(batch_size=2)))] == ["test1", "test2", "test3"]
+
+
+def test_async_completion_analytics(prepared_db, async_session_factory):
+    task_execution_dao = AsyncTaskExecutionDAO(session_factory=async_session_factory)
+
+    per_user = asyncio.run(task_execution_dao.get_completions_per_user())
+    asyncio.run(task_execution_dao.refresh_completion_stats())
+
+    assert [(c.user_id, c.completions) for c in per_user] == [(1, 1), (2, 0)]
+    assert round(per_user[0].completion_percentage, 2) == 33.33
+    assert asyncio.run(task_execution_dao.get_completions_per_user(from_view=True)) == per_user
+    assert [c.completions for c in asyncio.run(task_execution_dao.get_completions_per_period("week"))] == [1]
+    assert asyncio.run(task_execution_dao.get_time_to_complete()).count == 1
+
+
+def test_async_watch_task_executions_as_server_sent_events(prepared_db, async_session_factory):
+    task_execution_dao = AsyncTaskExecutionDAO(session_factory=async_session_factory)
+
+    async def watch():
+        # poll_interval is far longer than the wait below, so the second batch must come from the trigger's NOTIFY
+        events = server_sent_events(task_execution_dao.watch_task_executions(poll_interval=60), "changes", "cursor")
+        first = await anext(events)
+        await task_execution_dao.add_task_execution(CreateTaskExecution(task_id=2, user_id=1))
+        second = await asyncio.wait_for(anext(events), 10)
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(watch())
+
+    assert first.startswith("id: ") and "event: changes\n" in first and first.endswith("\n\n")
+    assert '"op": "insert", "task_execution": {"task_id": 1' in first
+    assert '"task_execution": {"task_id": 2' in second
+
+
+def test_async_task_tags(prepared_db, async_session_factory):
+    tagdao = AsyncTagDAO(session_factory=async_session_factory)
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+
+    assert asyncio.run(tagdao.tag_tasks(1, [1, 3])) == 2
+    asyncio.run(taskdao.set_task_tags(2, [1]))
+
+    assert [task.id for task in asyncio.run(taskdao.get_tasks_by_tags([1], limit=2))] == [1, 2]
+    assert [(tag.name, tag.tasks) for tag in asyncio.run(tagdao.get_tag_counts())] == [("Mechanics", 3)]
+    assert asyncio.run(tagdao.untag_tasks(1, [1, 2, 3])) == 3
+    assert asyncio.run(tagdao.get_tags_by_task(1)) == []
+
+
+def test_async_bulk_inserts(prepared_db, async_session_factory):
+    userdao = AsyncUserDAO(session_factory=async_session_factory)
+    taskdao = AsyncTaskDAO(session_factory=async_session_factory)
+    tagdao = AsyncTagDAO(session_factory=async_session_factory)
+    task_execution_dao = AsyncTaskExecutionDAO(session_factory=async_session_factory)
+    asyncio.run(taskdao.get_topological_order())
+
+    users = asyncio.run(userdao.add_users_bulk(
+        [SafeUserCreate(username=username, name="eve", surname="smith", password_hash="test")
+         for username in ["test", "bulk"]]))
+    tasks = asyncio.run(taskdao.add_tasks_bulk([CreateTask(name="test1", description="changed"),
+                                                CreateTask(name="test4", description="test4")], upsert=True))
+    tags = asyncio.run(tagdao.add_tags_bulk([CreateTag(name="Mechanics"), CreateTag(name="Brakes")]))
+    # Task 30 doesn't exist, so the batch is retried row by row.
+    task_executions = asyncio.run(task_execution_dao.add_task_executions_bulk(
+        [CreateTaskExecution(task_id=task_id, user_id=2) for task_id in [1, 2, 30]]))
+
+    assert (len(users.ids), users.conflicts) == (1, ["test"])
+    assert (len(tasks.ids), tasks.conflicts) == (2, [])
+    assert asyncio.run(taskdao.get_task_ancestors(max(tasks.ids))) == set()
+    assert (len(tags.ids), tags.conflicts) == (1, ["Mechanics"])
+    assert (len(task_executions.ids), task_executions.conflicts) == (1, [1, 30])
+
+
+def test_async_export_task_executions(prepared_db, async_session_factory):
+    prepared_db.add(TaskExecutionDB(task_id=2, user_id=2))
+    prepared_db.commit()
+    task_execution_dao = AsyncTaskExecutionDAO(session_factory=async_session_factory)
+
+    async def collect():
+        return [chunk async for chunk in task_execution_dao.export_task_executions(chunk_size=1)]
+
+    chunks = asyncio.run(collect())
+
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert np.concatenate(chunks)[["id", "task_id", "user_id"]].tolist() == [(1, 1, 1), (2, 2, 2)]
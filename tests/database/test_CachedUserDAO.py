@@ -0,0 +1,138 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import event
+
+from src.database._db import SessionLocal, Base, engine
+from src.config import Settings
+from src.database import user_cache
+from src.database.user_cache import CachedUserDAO, InMemoryUserCache, SharedUserCache, UserCache, get_user_dao
+from src.database.user_db import UserDAO, UserDB, UserNotFound
+from src.schemas.users import SafeUserCreate
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def set(self, name, value, ex=None):
+        self.values[name] = value
+
+    def delete(self, *names):
+        for name in names:
+            self.values.pop(name, None)
+
+
+@pytest.fixture
+def prepared_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+    db.add(UserDB(username='test2', name="john", surname="smith", password_hash='test'))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def statements():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(engine, "before_cursor_execute", listener)
+
+
+@pytest.mark.parametrize("cache_factory", [InMemoryUserCache, lambda: SharedUserCache(FakeRedis())])
+def test_get_user_by_username_is_cached(prepared_db, statements, cache_factory):
+    cache = cache_factory()
+    userdao = CachedUserDAO(session_factory=SessionLocal, cache=cache)
+
+    assert userdao.get_user_by_username("test").name == "adam"
+    assert userdao.get_user_by_username("test").name == "adam"
+    assert userdao.get_user_by_id(1).username == "test"
+
+    assert len(statements) == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_missing_user_is_not_cached(prepared_db, statements):
+    userdao = CachedUserDAO(session_factory=SessionLocal, cache=InMemoryUserCache())
+
+    assert userdao.get_user_by_username("not_test_name") is None
+    assert userdao.get_user_by_username("not_test_name") is None
+    assert len(statements) == 2
+
+
+def test_modify_user_invalidates(prepared_db):
+    userdao = CachedUserDAO(session_factory=SessionLocal, cache=InMemoryUserCache())
+    userdao.get_user_by_username("test")
+
+    userdao.modify_user(1, username="renamed", name="new_name")
+
+    assert userdao.get_user_by_username("test") is None
+    assert userdao.get_user_by_id(1).name == "new_name"
+    assert userdao.get_user_by_username("renamed").id == 1
+
+
+def test_delete_user_invalidates(prepared_db):
+    userdao = CachedUserDAO(session_factory=SessionLocal, cache=InMemoryUserCache())
+    userdao.get_user_by_id(2)
+
+    userdao.delete_user(2)
+
+    assert userdao.get_user_by_id(2) is None
+    assert userdao.get_user_by_username("test2") is None
+    with pytest.raises(UserNotFound):
+        userdao.delete_user(2)
+
+
+def test_upsert_invalidates(prepared_db):
+    userdao = CachedUserDAO(session_factory=SessionLocal, cache=InMemoryUserCache())
+    userdao.get_user_by_id(1)
+
+    userdao.add_users_bulk([SafeUserCreate(username='test', name="eve", surname="smith", password_hash='test')],
+                           upsert=True)
+
+    assert userdao.get_user_by_id(1).name == "eve"
+
+
+def test_in_memory_cache_expires_and_evicts():
+    now = [0.0]
+    cache = InMemoryUserCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    users = {key: object() for key in "abc"}
+    cache.set("a", users["a"])
+    cache.set("b", users["b"])
+    cache.get("a")
+    cache.set("c", users["c"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is users["a"]
+    now[0] = 10
+    assert cache.get("c") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 1}
+
+
+def test_settings_select_the_cache_backend(monkeypatch):
+    def backend(**settings):
+        monkeypatch.setattr(user_cache, "get_settings", lambda: Settings(**settings))
+        user_cache.get_user_cache.cache_clear()
+        try:
+            return user_cache.get_user_cache()
+        finally:
+            user_cache.get_user_cache.cache_clear()
+
+    assert isinstance(backend(), InMemoryUserCache)
+    assert backend(user_cache_backend="none") is None
+    assert type(get_user_dao(session_factory=SessionLocal, cache=None)) is UserDAO
+    assert isinstance(get_user_dao(session_factory=SessionLocal, cache=InMemoryUserCache()), CachedUserDAO)
+    with pytest.raises(ValidationError):
+        Settings(user_cache_backend="shared")
+    with pytest.raises(TypeError):
+        UserCache()
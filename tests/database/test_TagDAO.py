@@ -2,7 +2,8 @@ import pytest
 from sqlalchemy.orm import Session
 
 from src.database._db import Base, SessionLocal, engine
-from src.database.tag_db import TagDB, TagDAO, TagAlreadyExists
+from src.database.tag_db import TagDB, TagDAO, TagAlreadyExists, TagNotFound
+from src.database.tasks_db import TaskDB
 from src.schemas.tags import CreateTag
 
 
@@ -89,3 +90,43 @@ def test_delete_tag(prepared_db: Session):
 
     tag_from_db = prepared_db.get(TagDB, 1)
     assert tag_from_db is None
+
+
+def test_add_tags_bulk(prepared_db: Session):
+    tagdao = TagDAO(session_factory=SessionLocal)
+    tags = [CreateTag(name="Hydraulics"), CreateTag(name="Safety"), CreateTag(name="Hydraulics"),
+            CreateTag(name="Avionics")]
+
+    result = tagdao.add_tags_bulk(tags)
+
+    assert sorted(result.conflicts) == ["Hydraulics", "Safety"]
+    assert len(result.ids) == 2
+    assert prepared_db.query(TagDB).count() == 5
+
+
+def test_get_tags_page_and_iter_tags(prepared_db: Session):
+    tagdao = TagDAO(session_factory=SessionLocal)
+
+    assert [tag.name for tag in tagdao.get_tags_page(after_id=1, limit=1)] == ["Electronics"]
+    assert [tag.name for tag in tagdao.iter_tags(batch_size=2)] == ["Mechanics", "Electronics", "Safety"]
+
+
+def test_tag_and_untag_tasks(prepared_db: Session):
+    prepared_db.add_all([TaskDB(name=f"task{i}", description="test") for i in range(1, 4)])
+    prepared_db.commit()
+    tagdao = TagDAO(session_factory=SessionLocal)
+
+    assert tagdao.tag_tasks(1, [1, 2, 99], batch_size=2) == 2
+    assert tagdao.tag_tasks(1, [2, 3]) == 1
+    assert tagdao.tag_tasks(2, [1]) == 1
+    assert [(tag.name, tag.tasks) for tag in tagdao.get_tag_counts()] \
+           == [("Mechanics", 3), ("Electronics", 1), ("Safety", 0)]
+    assert [tag.name for tag in tagdao.get_tags_by_task(1)] == ["Mechanics", "Electronics"]
+
+    assert tagdao.untag_tasks(1, [1, 3]) == 2
+    tagdao.delete_tag(2)
+
+    assert [tag.name for tag in tagdao.get_tags_by_task(1)] == []
+    assert [tag.name for tag in tagdao.get_tags_by_task(2)] == ["Mechanics"]
+    with pytest.raises(TagNotFound):
+        tagdao.tag_tasks(99, [1])
@@ -1,8 +1,16 @@
+import threading
+
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.database._db import Base, SessionLocal, engine
-from src.database.tasks_db import TaskDB, TaskDAO, TaskAlreadyExists
+from src.database.tag_db import TagDB, TagDAO, TagNotFound
+from src.database.task_execution_db import TaskExecutionDB
+from src.database.task_graph import TaskGraph
+from src.database.tasks_db import (TaskDB, TaskDAO, TaskAlreadyExists, TaskNotFound, TaskPrerequisiteCycle,
+                                   task_prerequisites)
+from src.database.user_db import UserDB
 from src.schemas.tasks import Task, CreateTask
 
 
@@ -129,3 +137,228 @@ def test_task_modify_add_existing_prerequisites(prepared_db):
     assert task_from_db.description == "test2"
     assert len(task_from_db.prerequisite_tasks) == 1
     assert task_from_db.prerequisite_tasks[0].name == "test1"
+
+
+def test_get_all_tasks_query_count_does_not_grow_with_prerequisites(prepared_db: Session):
+    previous = prepared_db.get(TaskDB, 3)
+    for i in range(20):
+        previous = TaskDB(name=f"chain{i}", description="chain", prerequisite_tasks=[previous])
+        prepared_db.add(previous)
+    prepared_db.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        tasks: list[Task] = TaskDAO(session_factory=SessionLocal).get_all_tasks()
+        task: Task = TaskDAO(session_factory=SessionLocal).get_task_by_name("chain19")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(tasks) == 23
+    assert tasks[-1].prerequisite_tasks[0].name == "chain18"
+    assert task.prerequisite_tasks[0].prerequisite_tasks[0].name == "chain17"
+    assert len(statements) == 5
+
+
+def test_get_task_ancestors_and_descendants(prepared_db):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+
+    assert taskdao.get_task_ancestors(3) == {1, 2}
+    assert taskdao.get_task_ancestors(1) == set()
+    assert taskdao.get_task_descendants(1) == {2, 3}
+    assert taskdao.get_task_descendants(3) == set()
+    with pytest.raises(TaskNotFound):
+        taskdao.get_task_ancestors(4)
+
+
+class InvalidatedGraph(TaskGraph):
+    # Another thread, e.g. a TaskImporter, invalidates the graph between the membership check and the closure.
+    def __contains__(self, task_id: int) -> bool:
+        found = super().__contains__(task_id)
+        invalidating = threading.Thread(target=self.invalidate)
+        invalidating.start()
+        invalidating.join(0.1)
+        return found
+
+
+def test_concurrent_invalidate_waits_for_readers(prepared_db):
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=InvalidatedGraph())
+
+    assert taskdao.get_task_ancestors(3) == {1, 2}
+    assert taskdao.get_task_descendants(1) == {2, 3}
+
+
+def test_get_topological_order(prepared_db):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+    taskdao.add_task(CreateTask(name="test4", description="test4"))
+    task3 = Task(id=3, name="test3", description="test3", prerequisite_tasks=[])
+    taskdao.modify_task(1, prerequisite_tasks=[Task(id=4, name="test4", description="test4", prerequisite_tasks=[])])
+
+    assert taskdao.get_topological_order() == [4, 1, 2, 3]
+    assert taskdao.get_task_descendants(4) == {1, 2, 3}
+    with pytest.raises(TaskPrerequisiteCycle):
+        taskdao.modify_task(4, prerequisite_tasks=[task3])
+
+
+def test_modify_task_rejects_cycle(prepared_db):
+    graph = TaskGraph()
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=graph)
+    task3 = Task(id=3, name="test3", description="test3", prerequisite_tasks=[])
+
+    with pytest.raises(TaskPrerequisiteCycle) as e:
+        taskdao.modify_task(1, prerequisite_tasks=[task3])
+    assert e.value.prerequisite_ids == [3]
+    with pytest.raises(TaskPrerequisiteCycle):
+        taskdao.modify_task(1, prerequisite_tasks=[Task(id=1, name="test1", description="test1",
+                                                        prerequisite_tasks=[])])
+
+    assert len(prepared_db.get(TaskDB, 1).prerequisite_tasks) == 0
+    assert taskdao.get_task_ancestors(1) == set()
+
+
+def test_modify_task_checks_cycles_against_the_database(prepared_db):
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=TaskGraph())
+    prepared_db.add(TaskDB(name="test4", description="test4"))
+    prepared_db.commit()
+    taskdao.get_topological_order()
+    # Written by another process, so the graph doesn't know test4 needs test3.
+    prepared_db.execute(insert(task_prerequisites).values(task_id=4, prerequisite_id=3))
+    prepared_db.commit()
+
+    with pytest.raises(TaskPrerequisiteCycle):
+        taskdao.modify_task(1, prerequisite_tasks=[Task.construct(id=4)])
+
+
+def test_modify_task_patches_graph(prepared_db):
+    graph = TaskGraph()
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=graph)
+    assert taskdao.get_task_ancestors(3) == {1, 2}
+
+    taskdao.modify_task(3, prerequisite_tasks=[])
+    taskdao.modify_task(1, prerequisite_tasks=[Task(id=3, name="test3", description="test3", prerequisite_tasks=[])])
+
+    assert graph.ancestors(2) == {1, 3}
+    assert graph.descendants(3) == {1, 2}
+
+
+def test_modify_task_replaces_prerequisites_in_bulk(prepared_db, query_budget):
+    graph = TaskGraph()
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=graph)
+    prepared_db.add_all([TaskDB(name=f"test{i}", description="") for i in range(4, 8)])
+    prepared_db.commit()
+    taskdao.get_topological_order()
+    prerequisites = [Task.construct(id=id) for id in [4, 5, 6, 7, 4]]
+
+    with query_budget(5):
+        taskdao.modify_task(3, description="modified", prerequisite_tasks=prerequisites)
+
+    prepared_db.expire_all()
+    assert prepared_db.get(TaskDB, 3).description == "modified"
+    assert {task.id for task in prepared_db.get(TaskDB, 3).prerequisite_tasks} == {4, 5, 6, 7}
+    assert graph.ancestors(3) == {4, 5, 6, 7}
+    with pytest.raises(TaskNotFound):
+        taskdao.modify_task(8, prerequisite_tasks=[])
+    with pytest.raises(TaskNotFound):
+        taskdao.modify_task(8, wrong_parameter="")
+    with pytest.raises(AttributeError):
+        taskdao.modify_task(3, wrong_parameter="")
+
+
+def test_get_available_tasks(prepared_db: Session):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+    prepared_db.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+    prepared_db.add(TaskDB(name="test4", description="test4"))
+    prepared_db.commit()
+
+    assert [task.name for task in taskdao.get_available_tasks(1)] == ["test1", "test4"]
+
+    prepared_db.add(TaskExecutionDB(task_id=1, user_id=1))
+    prepared_db.commit()
+    tasks: list[Task] = taskdao.get_available_tasks(1)
+
+    assert [task.name for task in tasks] == ["test2", "test4"]
+    assert tasks[0].prerequisite_tasks[0].name == "test1"
+    assert [task.name for task in taskdao.get_available_tasks(2)] == ["test1", "test4"]
+
+
+def test_add_tasks_bulk_upsert(prepared_db: Session):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+    tasks = [CreateTask(name="test1", description="changed"), CreateTask(name="test4", description="test4")]
+
+    result = taskdao.add_tasks_bulk(tasks, upsert=True)
+
+    assert result.conflicts == []
+    assert len(result.ids) == 2
+    prepared_db.expire_all()
+    assert prepared_db.get(TaskDB, 1).description == "changed"
+    assert taskdao.get_topological_order()[-1] > 3
+
+
+def test_get_tasks_page_and_iter_tasks(prepared_db):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+
+    page: list[Task] = taskdao.get_tasks_page(after_id=2, limit=10)
+
+    assert [task.name for task in page] == ["test3"]
+    assert [task.name for task in page[0].prerequisite_tasks] == ["test1", "test2"]
+    assert [task.name for task in taskdao.iter_tasks(batch_size=2)] == ["test1", "test2", "test3"]
+
+
+def test_get_tasks_by_tags(prepared_db: Session):
+    prepared_db.add_all([TagDB(name="Mechanics"), TagDB(name="Safety")])
+    prepared_db.commit()
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=TaskGraph())
+    tagdao = TagDAO(session_factory=SessionLocal)
+    tagdao.tag_tasks(1, [1, 2, 3])
+    taskdao.set_task_tags(2, [2])
+    taskdao.set_task_tags(3, [1, 2])
+
+    assert [task.id for task in taskdao.get_tasks_by_tags([1, 2])] == [1, 2, 3]
+    assert [task.id for task in taskdao.get_tasks_by_tags([1, 2], match_all=True)] == [3]
+    assert [task.id for task in taskdao.get_tasks_by_tags([1, 2], after_id=1, limit=1)] == [2]
+    assert [task.id for task in taskdao.get_tasks_by_tags([2])] == [2, 3]
+    assert taskdao.get_tasks_by_tags([]) == []
+    assert [prerequisite.id for prerequisite in taskdao.get_tasks_by_tags([2], match_all=True)[1]
+            .prerequisite_tasks] == [1, 2]
+
+    with pytest.raises(TagNotFound):
+        taskdao.set_task_tags(1, [2, 99])
+    with pytest.raises(TaskNotFound):
+        taskdao.set_task_tags(99, [1])
+    assert [task.id for task in taskdao.get_tasks_by_tags([2])] == [2, 3]
+
+
+def _search_fixture(taskdao: TaskDAO):
+    taskdao.add_tasks_bulk([CreateTask(name="Check brakes", description="front and rear brake pads"),
+                            CreateTask(name="Brake fluid", description="replace"),
+                            CreateTask(name="Tyres", description="pressure check"),
+                            CreateTask(name="100%_done", description="")])
+
+
+def test_search_and_autocomplete_tasks(prepared_db: Session):
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=TaskGraph())
+    _search_fixture(taskdao)
+
+    assert [task.name for task in taskdao.search_tasks("brak")] == ["Check brakes", "Brake fluid"]
+    assert [task.name for task in taskdao.search_tasks("BRAKE pads")] == ["Check brakes"]
+    assert [task.name for task in taskdao.search_tasks("brak", limit=1, offset=1)] == ["Brake fluid"]
+    assert [task.name for task in taskdao.search_tasks("test2")][0] == "test2"
+    assert taskdao.search_tasks("  & | !:* ") == []
+    assert taskdao.autocomplete_tasks("b") == ["Brake fluid"]
+    assert taskdao.autocomplete_tasks("TEST", limit=2) == ["test1", "test2"]
+    assert taskdao.autocomplete_tasks("100%_") == ["100%_done"]
+    assert taskdao.autocomplete_tasks("1000") == []
+
+
+def test_search_tasks_sqlite_fallback(tmp_path):
+    sqlite_engine = create_engine(f"sqlite:///{tmp_path / 'search.sqlite'}")
+    Base.metadata.create_all(bind=sqlite_engine)
+    taskdao = TaskDAO(session_factory=sessionmaker(bind=sqlite_engine), graph=TaskGraph())
+    _search_fixture(taskdao)
+    taskdao.modify_task(2, name="Coolant")
+
+    assert [task.name for task in taskdao.search_tasks("brak")] == ["Check brakes"]
+    assert [task.name for task in taskdao.search_tasks("cool")] == ["Coolant"]
+    assert taskdao.autocomplete_tasks("c") == ["Check brakes", "Coolant"]
+    Base.metadata.drop_all(bind=sqlite_engine)
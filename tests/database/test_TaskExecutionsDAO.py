@@ -1,8 +1,15 @@
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.database._db import SessionLocal, Base, engine
-from src.database.task_execution_db import TaskExecutionDB, TaskExecutionDAO, TaskAlreadyDone, TaskExecutionNotFound
+from src.database.task_execution_db import (TaskExecutionDB, TaskExecutionDAO, TaskAlreadyDone, TaskExecutionNotFound,
+                                            InvalidChangeCursor)
 from src.database.tasks_db import TaskDB
 from src.database.user_db import UserDB
 from src.schemas.task_executions import CreateTaskExecution
@@ -126,3 +133,153 @@ def test_delete_task_execution_by_task_id_not_found(prepared_db: Session):
     with pytest.raises(TaskExecutionNotFound) as e:
         task_execution_dao.delete_task_execution_by_task_id(5)
         assert e.value.task_id == 5
+
+
+def test_add_task_executions_bulk_reports_failing_rows(prepared_db: Session):
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+    task_executions = [CreateTaskExecution(user_id=1, task_id=3),
+                       CreateTaskExecution(user_id=1, task_id=1),
+                       CreateTaskExecution(user_id=1, task_id=99)]
+
+    result = task_execution_dao.add_task_executions_bulk(task_executions)
+
+    assert sorted(result.conflicts) == [1, 99]
+    assert len(result.ids) == 1
+    assert prepared_db.query(TaskExecutionDB).filter(TaskExecutionDB.task_id == 3).first().user_id == 1
+
+
+def test_get_task_executions_page_and_iter(prepared_db: Session):
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+
+    assert [task_execution.id for task_execution in task_execution_dao.get_task_executions_page(limit=2)] == [1, 2]
+    assert [task_execution.id for task_execution in task_execution_dao.get_task_executions_page(after_id=2)] == [5]
+    assert [task_execution.task_id for task_execution in task_execution_dao.iter_task_executions(batch_size=1)] \
+           == [1, 2, 30]
+
+
+def _date_executions(db: Session):
+    db.add(UserDB(username='test2', name="john", surname="smith", password_hash='test'))
+    db.get(UserDB, 1).created_at = datetime(2023, 1, 1)
+    db.get(TaskExecutionDB, 1).execution_date = datetime(2023, 1, 2)
+    db.get(TaskExecutionDB, 2).execution_date = datetime(2023, 1, 2, 12)
+    db.get(TaskExecutionDB, 5).execution_date = datetime(2023, 1, 8)
+    db.commit()
+
+
+def test_completion_analytics(prepared_db: Session):
+    _date_executions(prepared_db)
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+
+    assert [(c.task_id, c.completions) for c in task_execution_dao.get_completions_per_task()] \
+           == [(1, 1), (2, 1), (3, 0), (30, 1)]
+    assert [(c.user_id, c.completions, c.completion_percentage)
+            for c in task_execution_dao.get_completions_per_user()] == [(1, 3, 75.0), (2, 0, 0.0)]
+    assert [(c.period, c.completions) for c in task_execution_dao.get_completions_per_period("day")] \
+           == [(datetime(2023, 1, 2), 2), (datetime(2023, 1, 8), 1)]
+    assert [(c.period, c.completions) for c in task_execution_dao.get_completions_per_period("week")] \
+           == [(datetime(2023, 1, 2), 3)]
+    assert [(c.period, c.completions) for c in
+            task_execution_dao.get_completions_per_period("day", since=datetime(2023, 1, 3))] \
+           == [(datetime(2023, 1, 8), 1)]
+
+    time_to_complete = task_execution_dao.get_time_to_complete()
+    assert (time_to_complete.count, time_to_complete.min, time_to_complete.p50, time_to_complete.max) \
+           == (3, 86400, 129600, 7 * 86400)
+    assert task_execution_dao.get_time_to_complete(task_id=3).count == 0
+
+
+def test_completion_analytics_from_view(prepared_db: Session):
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+    task_execution_dao.refresh_completion_stats(concurrently=False)
+    _date_executions(prepared_db)
+
+    assert task_execution_dao.get_completions_per_period("week", from_view=True) \
+           != task_execution_dao.get_completions_per_period("week")
+
+    task_execution_dao.refresh_completion_stats()
+
+    assert task_execution_dao.get_completions_per_period("week", from_view=True) \
+           == task_execution_dao.get_completions_per_period("week")
+    assert task_execution_dao.get_completions_per_user(from_view=True) \
+           == task_execution_dao.get_completions_per_user()
+
+
+def test_task_executions_change_feed(prepared_db: Session):
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+    initial = task_execution_dao.get_task_executions_since()
+
+    assert [(change.op, change.id) for change in initial.changes] == [("insert", 1), ("insert", 2), ("insert", 5)]
+    assert task_execution_dao.get_task_executions_since(initial.cursor).changes == []
+
+    task_execution_dao.add_task_execution(CreateTaskExecution(user_id=1, task_id=3))
+    task_execution_dao.delete_task_execution(1)
+    task_execution_dao.add_task_executions_bulk([CreateTaskExecution(user_id=1, task_id=30)], upsert=True)
+    first = task_execution_dao.get_task_executions_since(initial.cursor, limit=2)
+    rest = task_execution_dao.get_task_executions_since(first.cursor)
+    changes = first.changes + rest.changes
+
+    assert [(change.op, change.id) for change in changes] == [("insert", 3), ("delete", 1), ("update", 5)]
+    assert changes[0].task_execution.task_id == 3
+    assert changes[1].task_execution is None
+    assert task_execution_dao.get_task_executions_since(task_execution_dao.get_change_cursor()).changes == []
+    with pytest.raises(InvalidChangeCursor):
+        task_execution_dao.get_task_executions_since("not a cursor")
+
+
+def _exported(prepared_db: Session) -> list[tuple]:
+    prepared_db.execute(update(TaskExecutionDB).where(TaskExecutionDB.id == 2).values(execution_date=None))
+    prepared_db.commit()
+    return [(execution.id, execution.task_id, execution.user_id, execution.execution_date)
+            for execution in prepared_db.query(TaskExecutionDB).order_by(TaskExecutionDB.id)]
+
+
+def test_export_task_executions_numpy(prepared_db: Session):
+    expected = _exported(prepared_db)
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+
+    chunks = list(task_execution_dao.export_task_executions(chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    executions = np.concatenate(chunks)
+    assert executions.dtype.names == ("id", "task_id", "user_id", "execution_date")
+    assert executions.itemsize == 20
+    assert executions[["id", "task_id", "user_id"]].tolist() == [row[:3] for row in expected]
+    assert executions["execution_date"][0] == np.datetime64(expected[0][3], "us")
+    assert np.isnat(executions["execution_date"][1])
+    with pytest.raises(ValueError):
+        list(task_execution_dao.export_task_executions("csv"))
+
+
+def test_export_task_executions_arrow_and_parquet(prepared_db: Session, tmp_path):
+    expected = _exported(prepared_db)
+    task_execution_dao = TaskExecutionDAO(session_factory=SessionLocal)
+
+    table = pa.Table.from_batches(list(task_execution_dao.export_task_executions("arrow", chunk_size=2)))
+    assert table.to_pylist() == [dict(zip(["id", "task_id", "user_id", "execution_date"], row)) for row in expected]
+    assert table.schema.field("execution_date").type == pa.timestamp("us")
+
+    assert task_execution_dao.export_task_executions_parquet(str(tmp_path / "executions.parquet"), chunk_size=2) == 3
+    assert pyarrow.parquet.read_table(tmp_path / "executions.parquet").equals(table)
+
+
+def test_export_task_executions_without_copy(prepared_db: Session, tmp_path):
+    expected = _exported(prepared_db)
+    sqlite_engine = create_engine(f"sqlite:///{tmp_path / 'export.sqlite'}")
+    Base.metadata.create_all(bind=sqlite_engine)
+    with sessionmaker(bind=sqlite_engine)() as session:
+        session.add_all([TaskDB(id=task_id, name=f"task{task_id}") for _, task_id, _, _ in expected])
+        session.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+        session.add_all([TaskExecutionDB(id=id, task_id=task_id, user_id=user_id, execution_date=execution_date)
+                         for id, task_id, user_id, execution_date in expected])
+        session.commit()
+        session.execute(update(TaskExecutionDB).where(TaskExecutionDB.id == 2).values(execution_date=None))
+        session.commit()
+
+    chunks = list(TaskExecutionDAO(session_factory=sessionmaker(bind=sqlite_engine)).export_task_executions(
+        chunk_size=2))
+
+    executions = np.concatenate(chunks)
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert executions[["id", "task_id", "user_id"]].tolist() == [row[:3] for row in expected]
+    assert np.isnat(executions["execution_date"][1])
+    Base.metadata.drop_all(bind=sqlite_engine)
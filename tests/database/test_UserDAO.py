@@ -1,8 +1,12 @@
+import json
+
 import pytest
+from pydantic import ValidationError
 
 from src.database._db import SessionLocal, Base, engine
-from src.database.user_db import UserDAO, UserDB, UserAlreadyExists
-from src.schemas.users import User, SafeUserCreate
+from src.database._streaming import ndjson
+from src.database.user_db import UserDAO, UserDB, UserAlreadyExists, UserNotFound
+from src.schemas.users import User, SafeUserCreate, UserInDB
 
 
 @pytest.fixture
@@ -104,6 +108,16 @@ def test_modify_user_surname(prepared_db):
     assert user_from_db.surname == "new_surname"
 
 
+def test_modify_user_to_null_is_validated(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+
+    # is_superuser is a nullable column but not Optional in UserInDB, so from_orm would reject the row as well.
+    with pytest.raises(ValidationError):
+        userdao.modify_user(1, is_superuser=None)
+
+    assert prepared_db.get(UserDB, 1).is_superuser is False
+
+
 def test_modify_wrong_parameter(prepared_db):
     userdao = UserDAO(session_factory=SessionLocal)
     with pytest.raises(AttributeError) as e:
@@ -111,6 +125,24 @@ def test_modify_wrong_parameter(prepared_db):
         assert e.value.message == "AttributeError: 'UserDAO' object has no attribute wrong_parameter"
 
 
+def test_modify_and_delete_user_are_single_statements(prepared_db, query_budget):
+    userdao = UserDAO(session_factory=SessionLocal)
+
+    with query_budget(1):
+        user = userdao.modify_user(1, name="new_name", surname="new_surname")
+    assert (user.id, user.username, user.name, user.surname) == (1, "test", "new_name", "new_surname")
+    with query_budget(1):
+        assert userdao.delete_user(2).username == "test2"
+
+    with pytest.raises(UserNotFound):
+        userdao.modify_user(2, name="new_name")
+    with pytest.raises(UserNotFound):
+        userdao.modify_user(2, wrong_parameter="new_name")
+    with pytest.raises(UserNotFound):
+        userdao.delete_user(2)
+    assert userdao.modify_user(1).name == "new_name"
+
+
 def test_delete_user(prepared_db):
     userdao = UserDAO(session_factory=SessionLocal)
     userdao.delete_user(id=1)
@@ -118,3 +150,78 @@ def test_delete_user(prepared_db):
     user_from_db = prepared_db.query(UserDB).filter(UserDB.id == 1).first()
 
     assert user_from_db is None
+
+
+def test_add_users_bulk(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+    users = [SafeUserCreate(username=f'bulk{i}', name="adam", surname="Kowalski", password_hash='test')
+             for i in range(5)]
+    users.append(SafeUserCreate(username='test', name="adam", surname="Kowalski", password_hash='test'))
+
+    result = userdao.add_users_bulk(users, batch_size=2)
+
+    assert result.ids == [4, 5, 6, 7, 8]
+    assert result.conflicts == ['test']
+    assert prepared_db.query(UserDB).filter(UserDB.username == 'test').first().surname == 'smith'
+
+
+def test_add_users_bulk_upsert(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+    users = [SafeUserCreate(username='test', name="adam", surname="Kowalski", password_hash='new'),
+             SafeUserCreate(username='test4', name="john", surname="Kowalski", password_hash='test')]
+
+    result = userdao.add_users_bulk(users, upsert=True)
+
+    assert result.conflicts == []
+    assert len(result.ids) == 2
+    user_from_db = prepared_db.query(UserDB).filter(UserDB.username == 'test').first()
+    assert user_from_db.surname == 'Kowalski'
+    assert user_from_db.password_hash == 'new'
+
+
+def test_get_users_page(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+
+    first_page = userdao.get_users_page(limit=2)
+    second_page = userdao.get_users_page(after_id=first_page[-1].id, limit=2)
+
+    assert [user.username for user in first_page] == ["test", "test2"]
+    assert [user.username for user in second_page] == ["test3"]
+    assert userdao.get_users_page(after_id=3) == []
+    assert "password_hash" not in first_page[0].dict()
+
+
+def test_iter_users_as_ndjson(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+
+    lines = list(ndjson(userdao.iter_users(batch_size=2)))
+
+    assert len(lines) == 3
+    assert json.loads(lines[2])["username"] == "test3"
+    assert "password_hash" not in json.loads(lines[2])
+
+
+def test_listed_users_match_validated_users(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+    with SessionLocal() as session:
+        validated = [UserInDB.from_orm(user) for user in session.query(UserDB).order_by(UserDB.id)]
+
+    users = userdao.get_all_users()
+    users.sort(key=lambda user: user.id)
+
+    assert users == validated
+    assert [user.dict() for user in users] == [user.dict() for user in validated]
+    assert users[0].__fields_set__ == validated[0].__fields_set__
+    users[0].name = "changed"
+    assert users[0].copy(update={"surname": "changed"}).dict()["name"] == "changed"
+
+
+def test_search_and_autocomplete_users(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+
+    assert [user.username for user in userdao.search_users("smith")] == ["test", "test2", "test3"]
+    assert [user.username for user in userdao.search_users("jo smi")] == ["test2"]
+    assert "password_hash" not in userdao.search_users("jo smi")[0].dict()
+    assert userdao.search_users("kowalski") == []
+    assert userdao.autocomplete_users("TEST") == ["test", "test2", "test3"]
+    assert userdao.autocomplete_users("test2") == ["test2"]
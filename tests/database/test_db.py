@@ -1,7 +1,9 @@
 import pytest
+from sqlalchemy import create_engine, text
 from sqlalchemy.exc import IntegrityError
 
-from src.database._db import SessionLocal, Base
+from src.config import Settings
+from src.database._db import SessionLocal, Base, _db_url, _engine_options, get_pool_metrics
 from src.database.user_db import UserDB
 
 
@@ -58,3 +60,29 @@ def test_modifying_user(db):
 
     assert len(db.query(UserDB).all()) == 1
     assert user_after_modification.username == 'test2'
+
+
+def test_engine_uses_pool_settings():
+    settings = Settings(db_pool_size=2, db_max_overflow=1, db_statement_timeout_ms=1500)
+    engine = create_engine(_db_url, **_engine_options(settings))
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SHOW statement_timeout")).scalar() == "1500ms"
+    assert engine.pool.size() == 2
+    assert get_pool_metrics(engine) is None
+    engine.dispose()
+
+
+def test_pool_metrics():
+    settings = Settings(db_pool_size=1, db_max_overflow=1, db_pool_metrics=True)
+    engine = create_engine(_db_url, **_engine_options(settings))
+    metrics = get_pool_metrics(engine)
+
+    with engine.connect(), engine.connect():
+        assert metrics.checked_out == 2
+    assert metrics.checked_out == 0
+    assert metrics.checkouts == 2
+    assert metrics.overflow_events == 1
+
+    engine.dispose()
+    assert get_pool_metrics(engine) is metrics
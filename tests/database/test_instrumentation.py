@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.database._db import Base, SessionLocal, engine, _async_db_url
+from src.database.instrumentation import query_metrics, instrument_engine
+from src.database.tasks_db import TaskDB, TaskDAO, AsyncTaskDAO
+from src.database.user_db import UserDB, UserDAO
+
+
+@pytest.fixture
+def prepared_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    task1 = TaskDB(name="test1", description="test1")
+    task2 = TaskDB(name="test2", description="test2", prerequisite_tasks=[task1])
+    db.add_all([task1, task2, TaskDB(name="test3", description="test3", prerequisite_tasks=[task1, task2])])
+    db.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+    db.commit()
+    query_metrics.reset()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_query_budget(prepared_db, query_budget):
+    taskdao = TaskDAO(session_factory=SessionLocal)
+
+    with query_budget(2) as invocation:
+        taskdao.get_all_tasks()
+    assert invocation.statements == 2
+
+    with pytest.raises(AssertionError):
+        with query_budget(2):
+            taskdao.get_task_by_id(3)
+
+
+def test_dao_methods_record_metrics(prepared_db):
+    TaskDAO(session_factory=SessionLocal).get_all_tasks()
+    TaskDAO(session_factory=SessionLocal).get_all_tasks()
+    list(UserDAO(session_factory=SessionLocal).iter_users(batch_size=1))
+
+    metrics = query_metrics.snapshot()
+
+    assert metrics["TaskDAO.get_all_tasks"]["calls"] == 2
+    assert metrics["TaskDAO.get_all_tasks"]["statements"] == 4
+    assert metrics["TaskDAO.get_all_tasks"]["rows"] == 12
+    assert metrics["UserDAO.iter_users"]["statements"] == 1
+    assert metrics["UserDAO.iter_users"]["rows"] == 1
+
+
+def test_dml_records_returned_rows(prepared_db):
+    userdao = UserDAO(session_factory=SessionLocal)
+    userdao.delete_user(1)
+
+    assert query_metrics.snapshot()["UserDAO.delete_user"]["rows"] == 1
+
+
+def test_async_dao_methods_record_metrics(prepared_db):
+    async_engine = create_async_engine(_async_db_url, poolclass=NullPool)
+    instrument_engine(async_engine.sync_engine)
+    taskdao = AsyncTaskDAO(session_factory=async_sessionmaker(bind=async_engine))
+
+    asyncio.run(taskdao.get_task_by_id(3))
+
+    metrics = query_metrics.snapshot()["AsyncTaskDAO.get_task_by_id"]
+    assert metrics["statements"] == 3
+    assert metrics["rows"] == 7
+
+
+def test_render_prometheus(prepared_db):
+    UserDAO(session_factory=SessionLocal).get_user_by_id(1)
+
+    text = query_metrics.render_prometheus()
+
+    assert '# TYPE dao_statements_total counter' in text
+    assert 'dao_statements_total{method="UserDAO.get_user_by_id"} 1' in text
+    assert 'dao_duration_seconds_count{method="UserDAO.get_user_by_id"} 1' in text
+    assert 'dao_statements_per_call_bucket{method="UserDAO.get_user_by_id",le="1"} 1' in text
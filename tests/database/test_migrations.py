@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, select, text
+
+from src.database._db import SessionLocal, engine
+from src.database.task_execution_db import TaskExecutionDAO, TaskExecutionDB
+from src.database.task_graph import TaskGraph
+from src.database.tasks_db import TaskDAO
+
+ROWS = 1_000_000
+
+
+def _alembic(connection) -> Config:
+    config = Config("alembic.ini")
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@pytest.fixture
+def migrated_db():
+    with engine.begin() as connection:
+        command.upgrade(_alembic(connection), "head")
+    try:
+        yield
+    finally:
+        with engine.begin() as connection:
+            command.downgrade(_alembic(connection), "base")
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+@pytest.fixture
+def million_executions(migrated_db):
+    # Every task is executed once; task i depends on task i // 2, so the prerequisite graph is a shallow tree.
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (username, name, surname, password_hash, is_superuser, created_at) "
+            "SELECT 'user_' || i, 'name', 'surname', 'x', false, '2023-01-01' FROM generate_series(1, 10000) i"))
+        connection.execute(text(
+            f"INSERT INTO tasks (name, description) SELECT 'task_' || i, 'bench' FROM generate_series(1, {ROWS}) i"))
+        connection.execute(text(
+            f"INSERT INTO task_prerequisites (task_id, prerequisite_id) "
+            f"SELECT i, i / 2 FROM generate_series(2, {ROWS}) i"))
+        connection.execute(text(
+            f"INSERT INTO task_executions (task_id, user_id, execution_date) "
+            f"SELECT i, i % 10000 + 1, timestamp '2023-01-01' + i * interval '30 seconds' "
+            f"FROM generate_series(1, {ROWS}) i"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+
+
+def test_migrations_match_models(migrated_db):
+    with engine.connect() as connection:
+        command.check(_alembic(connection))
+
+
+class _Statements:
+    def __init__(self):
+        self.selects = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.selects.append((statement, parameters))
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _explain(statement: str, parameters) -> list[dict]:
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_plan_nodes(plan[0]["Plan"]))
+
+
+def _explain_dao_call(call) -> list[dict]:
+    statements = _Statements()
+    event.listen(engine, "before_cursor_execute", statements)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", statements)
+    return [node for statement, parameters in statements.selects for node in _explain(statement, parameters)]
+
+
+def _index_scans(nodes: list[dict]) -> set[str]:
+    return {node["Index Name"] for node in nodes if "Index Name" in node}
+
+
+def _seq_scanned(nodes: list[dict]) -> set[str]:
+    return {node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}
+
+
+def test_hot_lookups_use_indexes_at_1m_rows(million_executions):
+    executions = _explain_dao_call(lambda: TaskExecutionDAO(session_factory=SessionLocal)
+                                   .get_task_executions_by_user(42))
+    assert "ix_task_executions_user_id_execution_date" in _index_scans(executions)
+    assert "task_executions" not in _seq_scanned(executions)
+
+    dependants = _explain_dao_call(lambda: TaskDAO(session_factory=SessionLocal, graph=TaskGraph())
+                                   .get_tasks_by_prerequisite(1234))
+    assert "ix_task_prerequisites_prerequisite_id_task_id" in _index_scans(dependants)
+    assert "task_prerequisites" not in _seq_scanned(dependants)
+
+    date_range = select(TaskExecutionDB.id).where(TaskExecutionDB.execution_date >= "2023-02-01",
+                                                  TaskExecutionDB.execution_date < "2023-02-02")
+    with engine.connect() as connection:
+        compiled = date_range.compile(connection)
+    nodes = _explain(str(compiled), compiled.params)
+    assert "ix_task_executions_execution_date" in _index_scans(nodes)
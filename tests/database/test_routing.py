@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import math
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.database._db import Base, SessionLocal, engine, _db_url
+from src.database._routing import ReplicaRouter, RoutingSession, measure_lag
+from src.database.task_graph import TaskGraph
+from src.database.tasks_db import TaskDAO, TaskDB
+from src.database.unit_of_work import UnitOfWork
+from src.database.user_cache import CachedUserDAO, InMemoryUserCache
+from src.database.user_db import AsyncUserDAO, UserDAO, UserDB
+from src.schemas.tasks import CreateTask
+
+# A second database on the same server stands in for the replica. Its rows differ from the primary's, so every
+# read shows which engine served it.
+_replica_url = _db_url.set(database="replica_stand_in")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def replica():
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("DROP DATABASE IF EXISTS replica_stand_in")
+        connection.exec_driver_sql("CREATE DATABASE replica_stand_in")
+    replica = create_engine(_replica_url, poolclass=NullPool)
+    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=replica)
+    for bind, name in [(engine, "primary"), (replica, "replica")]:
+        with sessionmaker(bind=bind)() as session:
+            session.add(UserDB(username="test", name=name, surname="smith", password_hash="test"))
+            session.add(TaskDB(name=name, description=name))
+            session.commit()
+    try:
+        yield replica
+    finally:
+        replica.dispose()
+        Base.metadata.drop_all(bind=engine)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("DROP DATABASE replica_stand_in")
+
+
+def _routed(router: ReplicaRouter) -> sessionmaker:
+    return sessionmaker(bind=engine, class_=RoutingSession, router=router)
+
+
+def test_reads_go_to_replica_until_own_write(replica):
+    clock = Clock()
+    router = ReplicaRouter(engine, [replica], max_lag=5, lag=lambda primary, replica: 0, clock=clock)
+    userdao = UserDAO(session_factory=_routed(router))
+
+    def request():
+        userdao.modify_user(1, surname="written")
+        sticky = userdao.get_user_by_id(1).surname
+        clock.now = 5
+        return sticky, userdao.get_user_by_id(1).name
+
+    assert userdao.get_user_by_id(1).name == "replica"
+    # Each request runs in a context of its own.
+    assert contextvars.Context().run(request) == ("written", "replica")
+    assert userdao.get_user_by_id(1).surname == "smith"
+
+
+def test_lagging_or_unreachable_replicas_fall_back_to_primary(replica):
+    clock = Clock()
+    lags = {replica: 10.0}
+    router = ReplicaRouter(engine, [replica], max_lag=5, lag_check_interval=1,
+                           lag=lambda primary, replica: lags[replica], clock=clock)
+    userdao = UserDAO(session_factory=_routed(router))
+
+    assert userdao.get_user_by_id(1).name == "primary"
+    lags[replica] = 1.0
+    assert userdao.get_user_by_id(1).name == "primary"
+    clock.now = 1
+    assert userdao.get_user_by_id(1).name == "replica"
+
+    assert measure_lag(engine, engine) == 0
+    assert measure_lag(engine, replica) == 0
+    unreachable = create_engine(_db_url.set(port=1), poolclass=NullPool)
+    assert measure_lag(engine, unreachable) == math.inf
+
+
+def test_replica_strategies(replica):
+    other = create_engine(_replica_url)
+    round_robin = ReplicaRouter(engine, [replica, other], lag=lambda primary, replica: 0)
+    assert [round_robin.read_engine() for _ in range(4)] == [replica, other, replica, other]
+
+    least_connections = ReplicaRouter(engine, [other, replica], strategy="least_connections",
+                                      lag=lambda primary, replica: 0)
+    with other.connect():
+        assert least_connections.read_engine() is replica
+    assert least_connections.read_engine() is other
+    other.dispose()
+
+    with pytest.raises(ValueError):
+        ReplicaRouter(engine, [replica], strategy="random")
+
+
+def test_cache_fills_and_graph_loads_come_from_primary(replica):
+    router = ReplicaRouter(engine, [replica], lag=lambda primary, replica: 0)
+    session_factory = _routed(router)
+
+    assert CachedUserDAO(session_factory=session_factory, cache=InMemoryUserCache()).get_user_by_id(1).name == "primary"
+    taskdao = TaskDAO(session_factory=session_factory, graph=TaskGraph())
+    assert taskdao.get_topological_order() == [1]
+    assert taskdao.get_task_by_id(1).name == "replica"
+
+
+def test_writes_and_unit_of_work_use_primary(replica):
+    router = ReplicaRouter(engine, [replica], lag=lambda primary, replica: 0)
+    taskdao = TaskDAO(session_factory=_routed(router), graph=TaskGraph())
+
+    contextvars.Context().run(taskdao.add_task, CreateTask(name="test2", description="test2"))
+
+    with SessionLocal() as session:
+        assert session.get(TaskDB, 2).name == "test2"
+    assert taskdao.get_task_by_name("test2") is None
+    with UnitOfWork(_routed(router)) as unit_of_work:
+        assert TaskDAO(session_factory=unit_of_work).get_task_by_name("test2").id == 2
+
+
+def test_async_reads_go_to_replica(replica):
+    async def run():
+        primary = create_async_engine(_db_url.set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+        async_replica = create_async_engine(_replica_url.set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+        router = ReplicaRouter(primary.sync_engine, [async_replica.sync_engine], max_lag=60)
+        userdao = AsyncUserDAO(session_factory=async_sessionmaker(
+            bind=primary, expire_on_commit=False, sync_session_class=RoutingSession, router=router))
+        try:
+            assert (await userdao.get_user_by_id(1)).name == "replica"
+            await userdao.modify_user(1, surname="written")
+            assert (await userdao.get_user_by_id(1)).surname == "written"
+        finally:
+            await primary.dispose()
+            await async_replica.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_unreachable_replica_falls_back_to_primary(replica):
+    async def run():
+        primary = create_async_engine(_db_url.set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+        unreachable = create_async_engine(_db_url.set(drivername="postgresql+asyncpg", port=1), poolclass=NullPool)
+        router = ReplicaRouter(primary.sync_engine, [unreachable.sync_engine])
+        userdao = AsyncUserDAO(session_factory=async_sessionmaker(
+            bind=primary, expire_on_commit=False, sync_session_class=RoutingSession, router=router))
+        try:
+            return (await userdao.get_user_by_id(1)).name
+        finally:
+            await primary.dispose()
+
+    assert asyncio.run(run()) == "primary"
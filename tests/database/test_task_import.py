@@ -0,0 +1,152 @@
+import json
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from src.database._db import Base, SessionLocal, engine
+from src.database.task_graph import TaskGraph
+from src.database.task_import import TaskImporter, TaskImportCycle, TaskImportError
+from src.database.tasks_db import TaskDAO, TaskDB, task_prerequisites
+from src.database.unit_of_work import UnitOfWork
+from src.schemas.task_import import ImportProgress
+
+
+@pytest.fixture
+def prepared_db() -> Session:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    task1 = TaskDB(name="test1", description="test1")
+    db.add(task1)
+    db.add(TaskDB(name="test2", description="test2", prerequisite_tasks=[task1]))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _edges(db: Session) -> set[tuple[str, str]]:
+    task, prerequisite = TaskDB.__table__.alias(), TaskDB.__table__.alias()
+    return set(db.execute(select(task.c.name, prerequisite.c.name).select_from(task_prerequisites)
+                          .join(task, task.c.id == task_prerequisites.c.task_id)
+                          .join(prerequisite, prerequisite.c.id == task_prerequisites.c.prerequisite_id)).all())
+
+
+def _jsonl(*tasks: dict) -> list[str]:
+    return [json.dumps(task) + "\n" for task in tasks]
+
+
+def test_import_csv_resolves_prerequisites(prepared_db, query_budget):
+    graph = TaskGraph()
+    taskdao = TaskDAO(session_factory=SessionLocal, graph=graph)
+    taskdao.get_topological_order()
+    lines = ["name,description,prerequisites\n",
+             "Check tyres,,Park car\n",
+             "Park car,engine off,test2\n",
+             "test1,changed,\n"]
+
+    with query_budget(7):
+        result = TaskImporter(session_factory=SessionLocal, graph=graph).import_tasks(lines, "csv", batch_size=10)
+
+    assert (result.tasks, result.prerequisites, result.resumed_batches) == (3, 2, 0)
+    assert _edges(prepared_db) == {("Check tyres", "Park car"), ("Park car", "test2"), ("test2", "test1")}
+    assert prepared_db.scalar(select(TaskDB.description).where(TaskDB.name == "test1")) == "changed"
+    assert not graph.loaded
+    assert taskdao.get_task_ancestors(prepared_db.scalar(select(TaskDB.id).where(TaskDB.name == "Check tyres"))) == \
+        {1, 2, prepared_db.scalar(select(TaskDB.id).where(TaskDB.name == "Park car"))}
+
+
+def test_invalid_imports_write_nothing(prepared_db):
+    importer = TaskImporter(session_factory=SessionLocal)
+
+    with pytest.raises(TaskImportError) as e:
+        importer.import_tasks(_jsonl({"name": "a"}, {"name": "b", "prerequisites": ["missing"]}), "jsonl")
+    assert e.value.line == 2
+    with pytest.raises(TaskImportError):
+        importer.import_tasks(_jsonl({"name": "a"}, {"name": "a"}), "jsonl")
+    with pytest.raises(TaskImportError):
+        importer.import_tasks(_jsonl({"name": "a" * 51}), "jsonl")
+    # test2 already needs test1, so test1 may not need test2 through the new task.
+    with pytest.raises(TaskImportCycle) as e:
+        importer.import_tasks(_jsonl({"name": "a", "prerequisites": ["test2"]},
+                                     {"name": "test1", "prerequisites": ["a"]}), "jsonl")
+    assert e.value.names == ["a", "test2", "test1"]
+
+    assert prepared_db.scalars(select(TaskDB.name)).all() == ["test1", "test2"]
+    assert _edges(prepared_db) == {("test2", "test1")}
+
+
+def test_interrupted_import_resumes_from_checkpoint(prepared_db, tmp_path):
+    checkpoint = str(tmp_path / "tasks.checkpoint")
+    lines = _jsonl(*[{"name": f"task{i}", "prerequisites": [f"task{i - 1}"] if i else ["test1"]} for i in range(5)])
+    reports = []
+
+    def interrupt(progress: ImportProgress):
+        reports.append(progress)
+        if progress == ImportProgress(phase="tasks", done=4, total=5):
+            raise KeyboardInterrupt
+
+    importer = TaskImporter(session_factory=SessionLocal)
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_tasks(lines, "jsonl", batch_size=2, checkpoint=checkpoint, progress=interrupt)
+    assert [(report.phase, report.done) for report in reports] == [("tasks", 2), ("tasks", 4)]
+    assert _edges(prepared_db) == {("test2", "test1")}
+
+    result = importer.import_tasks(lines, "jsonl", batch_size=2, checkpoint=checkpoint)
+
+    assert (result.tasks, result.prerequisites, result.resumed_batches) == (1, 5, 2)
+    assert not (tmp_path / "tasks.checkpoint").exists()
+    assert _edges(prepared_db) == {("test2", "test1"), ("task0", "test1")} | {
+        (f"task{i}", f"task{i - 1}") for i in range(1, 5)}
+
+
+def test_import_commits_outside_a_unit_of_work(prepared_db, tmp_path):
+    # The checkpoint records every batch as done, so a rolled back unit of work mustn't undo them.
+    checkpoint = str(tmp_path / "tasks.checkpoint")
+    lines = _jsonl({"name": "a", "prerequisites": ["test1"]}, {"name": "b", "prerequisites": ["a"]})
+
+    def interrupt(progress: ImportProgress):
+        if progress.phase == "tasks":
+            raise KeyboardInterrupt
+
+    with UnitOfWork(SessionLocal) as unit_of_work, pytest.raises(KeyboardInterrupt):
+        TaskImporter(session_factory=unit_of_work).import_tasks(lines, "jsonl", batch_size=1, checkpoint=checkpoint,
+                                                                progress=interrupt)
+    result = TaskImporter(session_factory=SessionLocal).import_tasks(lines, "jsonl", batch_size=1,
+                                                                      checkpoint=checkpoint)
+
+    assert (result.tasks, result.resumed_batches) == (1, 1)
+    assert _edges(prepared_db) == {("test2", "test1"), ("a", "test1"), ("b", "a")}
+
+
+def test_reversed_prerequisites_are_replaced_together(prepared_db):
+    # With one transaction per batch, test1 -> test2 would commit while test2 -> test1 still existed.
+    lines = _jsonl({"name": "test1", "prerequisites": ["test2"]}, {"name": "test2"})
+
+    TaskImporter(session_factory=SessionLocal).import_tasks(lines, "jsonl", batch_size=1)
+
+    assert _edges(prepared_db) == {("test1", "test2")}
+
+
+def test_cycles_are_checked_again_when_writing_prerequisites(prepared_db):
+    def concurrent_edge(progress: ImportProgress):
+        if progress.phase == "tasks":
+            with SessionLocal() as session, session.begin():
+                session.execute(insert(task_prerequisites).values(task_id=1, prerequisite_id=3))
+
+    lines = _jsonl({"name": "a", "prerequisites": ["test2"]})
+    with pytest.raises(TaskImportCycle) as e:
+        TaskImporter(session_factory=SessionLocal).import_tasks(lines, "jsonl", progress=concurrent_edge)
+
+    assert set(e.value.names) == {"a", "test2", "test1"}
+    assert _edges(prepared_db) == {("test2", "test1"), ("test1", "a")}
+
+
+def test_find_cycle():
+    graph = TaskGraph()
+    graph.build([1, 2, 3, 4], [(2, 1), (3, 2), (2, 3), (4, 3)])
+    assert graph.find_cycle() == [2, 3]
+    graph.set_prerequisites(2, [1])
+    assert graph.find_cycle() is None
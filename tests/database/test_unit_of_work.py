@@ -0,0 +1,165 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.database._db import Base, SessionLocal, engine, _async_db_url, get_session_factory
+from src.database.task_execution_db import TaskExecutionDAO, TaskExecutionDB, AsyncTaskExecutionDAO
+from src.database.task_graph import TaskGraph
+from src.database.tasks_db import TaskDAO, TaskDB, AsyncTaskDAO, TaskAlreadyExists
+from src.database.unit_of_work import AsyncUnitOfWork, UnitOfWork, get_unit_of_work, join_unit_of_work
+from src.database.user_cache import CachedUserDAO, InMemoryUserCache
+from src.database.user_db import UserDAO, UserDB
+from src.schemas.task_executions import CreateTaskExecution
+from src.schemas.tasks import CreateTask, Task
+
+
+@pytest.fixture
+def prepared_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(TaskDB(name="test1", description="test1"))
+    db.add(UserDB(username='test', name="adam", surname="smith", password_hash='test'))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def engine_events():
+    counts = {"checkout": 0, "commit": 0}
+    listeners = [(engine.pool, "checkout", lambda *args: counts.update(checkout=counts["checkout"] + 1)),
+                 (engine, "commit", lambda *args: counts.update(commit=counts["commit"] + 1))]
+    for target, name, listener in listeners:
+        event.listen(target, name, listener)
+    yield counts
+    for target, name, listener in listeners:
+        event.remove(target, name, listener)
+
+
+def _task_names() -> set[str]:
+    with SessionLocal() as session:
+        return set(session.scalars(select(TaskDB.name)))
+
+
+def test_daos_share_one_connection_and_commit(prepared_db, engine_events):
+    with UnitOfWork(SessionLocal) as unit_of_work:
+        taskdao = TaskDAO(session_factory=unit_of_work, graph=TaskGraph())
+        executiondao = TaskExecutionDAO(session_factory=unit_of_work)
+        taskdao.add_task(CreateTask(name="test2", description="test2"))
+        taskdao.modify_task(2, prerequisite_tasks=[Task.construct(id=1)])
+        executiondao.add_task_execution(CreateTaskExecution(task_id=1, user_id=1))
+        assert UserDAO(session_factory=unit_of_work).get_user_by_id(1).username == "test"
+        unit_of_work.commit()
+
+    assert engine_events == {"checkout": 1, "commit": 1}
+    assert _task_names() == {"test1", "test2"}
+    assert TaskDAO(session_factory=SessionLocal, graph=taskdao.graph).get_task_ancestors(2) == {1}
+    assert prepared_db.scalar(select(TaskExecutionDB.task_id)) == 1
+
+
+def test_uncommitted_work_is_rolled_back(prepared_db):
+    graph = TaskGraph()
+    with UnitOfWork(SessionLocal) as unit_of_work:
+        taskdao = TaskDAO(session_factory=unit_of_work, graph=graph)
+        taskdao.get_topological_order()
+        taskdao.add_task(CreateTask(name="test2", description="test2"))
+        assert 2 not in graph
+        assert "test2" not in _task_names()
+
+    assert _task_names() == {"test1"}
+    assert TaskDAO(session_factory=SessionLocal, graph=graph).get_topological_order() == [1]
+
+
+def test_graph_is_patched_on_commit(prepared_db):
+    graph = TaskGraph()
+    with UnitOfWork(SessionLocal) as unit_of_work:
+        taskdao = TaskDAO(session_factory=unit_of_work, graph=graph)
+        taskdao.add_task(CreateTask(name="test2", description="test2"))
+        taskdao.modify_task(2, prerequisite_tasks=[Task.construct(id=1)])
+        # Other requests share the graph, and it is loaded from committed rows only.
+        assert taskdao.get_topological_order() == [1]
+        unit_of_work.commit()
+        assert taskdao.get_topological_order() == [1, 2]
+        assert graph.ancestors(2) == {1}
+
+
+def test_failed_write_dooms_the_unit_of_work(prepared_db):
+    with UnitOfWork(SessionLocal) as unit_of_work:
+        taskdao = TaskDAO(session_factory=unit_of_work, graph=TaskGraph())
+        taskdao.add_task(CreateTask(name="test2", description="test2"))
+        with pytest.raises(TaskAlreadyExists):
+            taskdao.add_task(CreateTask(name="test1", description="test1"))
+        with pytest.raises(Exception):
+            unit_of_work.commit()
+
+    assert _task_names() == {"test1"}
+
+
+def test_cached_user_is_invalidated_when_the_unit_of_work_ends(prepared_db):
+    cache = InMemoryUserCache()
+    with UnitOfWork(SessionLocal) as unit_of_work:
+        userdao = CachedUserDAO(session_factory=unit_of_work, cache=cache)
+        userdao.modify_user(1, name="adam2")
+        # Caches the uncommitted row, which must not outlive the rollback.
+        assert userdao.get_user_by_id(1).name == "adam2"
+
+    assert CachedUserDAO(session_factory=SessionLocal, cache=cache).get_user_by_id(1).name == "adam"
+
+
+def test_request_scoped_unit_of_work(prepared_db, engine_events):
+    app = FastAPI()
+    app.dependency_overrides[get_session_factory] = join_unit_of_work
+
+    def get_taskdao(session_factory=Depends(get_session_factory)):
+        return TaskDAO(session_factory=session_factory)
+
+    def get_executiondao(session_factory=Depends(get_session_factory)):
+        return TaskExecutionDAO(session_factory=session_factory)
+
+    @app.post("/tasks/{name}")
+    def add_task(name: str, taskdao: TaskDAO = Depends(get_taskdao),
+                 executiondao: TaskExecutionDAO = Depends(get_executiondao),
+                 unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
+        taskdao.add_task(CreateTask(name=name, description=name))
+        task = taskdao.get_task_by_name(name)
+        executiondao.add_task_execution(CreateTaskExecution(task_id=task.id, user_id=1))
+        unit_of_work.commit()
+        return task.id
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/tasks/test2")
+
+    assert asyncio.run(post()).json() == 2
+
+    assert engine_events == {"checkout": 1, "commit": 1}
+    assert _task_names() == {"test1", "test2"}
+
+
+def test_async_unit_of_work(prepared_db):
+    async def run():
+        async_engine = create_async_engine(_async_db_url, poolclass=NullPool)
+        try:
+            session_factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+            async with AsyncUnitOfWork(session_factory) as unit_of_work:
+                taskdao = AsyncTaskDAO(session_factory=unit_of_work, graph=TaskGraph())
+                await taskdao.add_task(CreateTask(name="test2", description="test2"))
+                await AsyncTaskExecutionDAO(session_factory=unit_of_work).add_task_execution(
+                    CreateTaskExecution(task_id=2, user_id=1))
+                await unit_of_work.commit()
+            async with AsyncUnitOfWork(session_factory) as unit_of_work:
+                await AsyncTaskDAO(session_factory=unit_of_work).add_task(CreateTask(name="test3", description=""))
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+    assert _task_names() == {"test1", "test2"}
+    assert prepared_db.scalar(select(TaskExecutionDB.task_id)) == 2
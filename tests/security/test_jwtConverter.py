@@ -4,8 +4,10 @@ import pytest
 from jose import jwt, JWTError
 
 from src.config import SecuritySetting
-from src.schemas.users import User
+from src.schemas.users import User, Principal
 from src.security.JwtConverter import JwtConverter
+from src.security.revocation import TokenRevocations
+from src.security.token_cache import TokenCache
 
 exp_time = timedelta(minutes=15)
 test_secret = "yqWlVAiIgqm1nqc5SEa1aM7C6lJ8JTrZ"
@@ -71,4 +73,68 @@ def test_exchange_user_to_jwt(get_user, converter):
     decoded = jwt.decode(token=token, key=test_secret)
 
     assert decoded.get("username") == "test_user"
-    assert decoded.get("is_superuser") == True
\ No newline at end of file
+    assert decoded.get("is_superuser") == True
+
+@pytest.fixture
+def stateless_converter(get_dummy_dao) -> JwtConverter:
+    config = SecuritySetting(jwt_secret=test_secret, jwt_stateless=True)
+    return JwtConverter(userdao=get_dummy_dao, config=config, revocations=TokenRevocations())
+
+def test_stateless_exchange_jwt_to_principal(get_user, stateless_converter):
+    stateless_converter.dao = None
+    principal = stateless_converter.get_user(stateless_converter.get_jwt(get_user))
+
+    assert isinstance(principal, Principal)
+    assert principal.id == 1
+    assert principal.username == "test_user"
+    assert principal.is_superuser is True
+
+def test_stateless_falls_back_to_lookup_without_user_id(get_jwt, stateless_converter):
+    user = stateless_converter.get_user(get_jwt)
+
+    assert isinstance(user, User)
+    assert user.name == "John"
+
+def test_revoked_jwt(get_user, stateless_converter):
+    token = stateless_converter.get_jwt(get_user)
+    stateless_converter.revocations.revoke(get_user.id)
+
+    with pytest.raises(JWTError):
+        stateless_converter.get_user(token)
+    assert stateless_converter.get_user(stateless_converter.get_jwt(get_user)).id == 1
+
+
+def test_verified_claims_are_cached(get_user, get_dummy_config, get_dummy_dao):
+    cache = TokenCache()
+    converter = JwtConverter(userdao=get_dummy_dao, config=get_dummy_config, token_cache=cache)
+    token = converter.get_jwt(get_user)
+
+    converter.get_user(token)
+    converter.get_user(token)
+
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+def test_token_cache_respects_secret_rotation(get_user, get_dummy_config, get_dummy_dao):
+    cache = TokenCache()
+    converter = JwtConverter(userdao=get_dummy_dao, config=get_dummy_config, token_cache=cache)
+    token = converter.get_jwt(get_user)
+    converter.get_user(token)
+
+    rotated = JwtConverter(userdao=get_dummy_dao, config=SecuritySetting(jwt_secret="rotated"), token_cache=cache)
+
+    with pytest.raises(JWTError):
+        rotated.get_user(token)
+
+def test_token_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TokenCache(maxsize=2, clock=lambda: now[0])
+    cache.set("key", "a", {"exp": 10})
+    cache.set("key", "b", {"exp": 20})
+    cache.get("key", "a")
+    cache.set("key", "c", {"exp": 20})
+
+    assert cache.get("key", "b") is None
+    assert cache.get("key", "a") == {"exp": 10}
+    now[0] = 10
+    assert cache.get("key", "a") is None
+    assert cache.get("key", "c") == {"exp": 20}
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwt
+from pydantic import ValidationError
+
+from src.config import SecuritySetting
+from src.schemas.users import User
+from src.security.JwtConverter import JwtConverter
+from src.security.keyring import KeyRing, SigningKeyUnavailable
+from src.security.token_cache import TokenCache
+
+
+def _write_key(path, private_key, public_only=False):
+    if public_only:
+        pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                    serialization.PublicFormat.SubjectPublicKeyInfo)
+    else:
+        pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption())
+    path.write_bytes(pem)
+
+
+@pytest.fixture
+def keys():
+    return {"old": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+            "new": ec.generate_private_key(ec.SECP256R1())}
+
+
+def _manifest(tmp_path, keys, name="keyring.json", public_only=False, old_verify_until=None):
+    _write_key(tmp_path / f"{name}-old.pem", keys["old"], public_only)
+    _write_key(tmp_path / f"{name}-new.pem", keys["new"], public_only)
+    old = {"kid": "old", "alg": "RS256", "key": f"{name}-old.pem"}
+    if old_verify_until:
+        old["verify_until"] = old_verify_until.isoformat()
+    manifest = {"active": "new", "keys": [old, {"kid": "new", "alg": "ES256", "key": f"{name}-new.pem"}]}
+    (tmp_path / name).write_text(json.dumps(manifest))
+    return tmp_path / name
+
+
+@pytest.fixture
+def get_user() -> User:
+    return User(id=1, is_superuser=True, created_at=datetime.utcnow(), username="test_user", name="John",
+                surname="Doe")
+
+
+def _converter(dao, keyring) -> JwtConverter:
+    return JwtConverter(userdao=dao, config=SecuritySetting(jwt_keyring_path="unused"), token_cache=TokenCache(),
+                        keyring=keyring)
+
+
+def test_sign_with_active_key_and_verify_on_public_only_replica(tmp_path, keys, get_user, get_dummy_dao):
+    signer = _converter(get_dummy_dao, KeyRing.from_manifest(_manifest(tmp_path, keys)))
+    verifier = _converter(get_dummy_dao, KeyRing.from_manifest(_manifest(tmp_path, keys, "public.json", True)))
+
+    token = signer.get_jwt(get_user)
+
+    assert jwt.get_unverified_header(token) == {"alg": "ES256", "kid": "new", "typ": "JWT"}
+    assert verifier.get_user(token).username == "test_user"
+    with pytest.raises(SigningKeyUnavailable):
+        verifier.get_jwt(get_user)
+
+
+def test_rotation_window(tmp_path, keys, get_user, get_dummy_dao):
+    old_signer = _converter(get_dummy_dao, KeyRing.from_manifest(_manifest(tmp_path, keys)))
+    old_signer.keyring.active_kid = "old"
+    token = old_signer.get_jwt(get_user)
+
+    in_window = KeyRing.from_manifest(_manifest(tmp_path, keys, old_verify_until=datetime.utcnow() + timedelta(days=1)))
+    after_window = KeyRing.from_manifest(_manifest(tmp_path, keys, old_verify_until=datetime.utcnow()))
+
+    assert _converter(get_dummy_dao, in_window).get_user(token).username == "test_user"
+    with pytest.raises(JWTError):
+        _converter(get_dummy_dao, after_window).get_user(token)
+
+
+def test_retired_active_key_never_signs(tmp_path, keys, get_user, get_dummy_dao):
+    keyring = KeyRing.from_manifest(_manifest(tmp_path, keys, old_verify_until=datetime.utcnow() + timedelta(days=1)))
+    keyring.active_kid = "old"
+
+    with pytest.raises(SigningKeyUnavailable):
+        _converter(get_dummy_dao, keyring).get_jwt(get_user)
+
+
+def test_verify_until_with_utc_offset(tmp_path, keys):
+    retired = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    for verify_until in [retired.isoformat(), retired.isoformat().replace("+00:00", "Z"),
+                         retired.astimezone(timezone(timedelta(hours=2))).isoformat()]:
+        manifest = json.loads(_manifest(tmp_path, keys).read_text())
+        manifest["keys"][0]["verify_until"] = verify_until
+        (tmp_path / "keyring.json").write_text(json.dumps(manifest))
+        with pytest.raises(JWTError):
+            KeyRing.from_manifest(tmp_path / "keyring.json").verification_key("old")
+
+
+def test_settings_need_a_secret_or_keyring():
+    with pytest.raises(ValidationError):
+        SecuritySetting()
+
+
+def test_unknown_kid_and_algorithm_mismatch(tmp_path, keys, get_user, get_dummy_dao):
+    converter = _converter(get_dummy_dao, KeyRing.from_manifest(_manifest(tmp_path, keys)))
+    hs_token = jwt.encode({"username": "test_user"}, "secret", headers={"kid": "new"})
+
+    with pytest.raises(JWTError):
+        converter.get_user(jwt.encode({"username": "test_user"}, "secret", headers={"kid": "missing"}))
+    with pytest.raises(JWTError):
+        converter.get_user(hs_token)
@@ -0,0 +1,107 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from datetime import datetime
+
+import pytest
+
+from src.config import SecuritySetting
+from src.schemas.users import UserCreate, UserInDB
+from src.security.passwords import PasswordService, PasswordServiceBusy
+from tests.security.conftest import FakeDAO
+
+cheap_params = {"time_cost": 1, "memory_cost": 1024, "parallelism": 1}
+
+
+class StoringDAO(FakeDAO):
+    def __init__(self, user: UserInDB):
+        self.user = user
+        self.modified = {}
+
+    def get_user_by_username(self, username: str) -> UserInDB | None:
+        return self.user if username == self.user.username else None
+
+    def modify_user(self, id: int, *args, **kwargs):
+        self.modified = kwargs
+
+
+@pytest.fixture
+def service():
+    service = PasswordService(**cheap_params, workers=1)
+    yield service
+    service.shutdown()
+
+
+def _user(password_hash: str) -> UserInDB:
+    return UserInDB(id=1, is_superuser=False, created_at=datetime.utcnow(), username="test_user", name="John",
+                    surname="Doe", password_hash=password_hash)
+
+
+def test_create_user_hashes_password(service):
+    safe_user = asyncio.run(service.create_user(UserCreate(username="test_user", name="John", surname="Doe",
+                                                           password="secret")))
+
+    assert safe_user.password_hash.startswith("$argon2id$")
+    assert asyncio.run(service.verify_password("secret", safe_user.password_hash)) == (True, None)
+    assert asyncio.run(service.verify_password("wrong", safe_user.password_hash)) == (False, None)
+
+
+def test_authenticate_rehashes_when_parameters_change(service):
+    old_hash = asyncio.run(service.hash_password("secret"))
+    stronger = PasswordService(time_cost=2, memory_cost=1024, parallelism=1, executor=service.executor)
+    dao = StoringDAO(_user(old_hash))
+
+    user = asyncio.run(stronger.authenticate(dao, "test_user", "secret"))
+
+    assert user.password_hash == dao.modified["password_hash"]
+    assert "t=2" in user.password_hash
+    assert asyncio.run(stronger.authenticate(dao, "test_user", "wrong")) is None
+    assert asyncio.run(stronger.authenticate(dao, "nobody", "secret")) is None
+
+
+class BlockedExecutor(Executor):
+    # Holds every submitted hash until release(), so the service's slots stay taken.
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.pending.append((future, fn, args))
+        return future
+
+    def release(self):
+        for future, fn, args in self.pending:
+            future.set_result(fn(*args))
+        self.pending = []
+
+
+def test_saturated_service_returns_503():
+    executor = BlockedExecutor()
+    busy = PasswordService(**cheap_params, queue_limit=2, executor=executor)
+
+    async def hash_released(count: int) -> list[str]:
+        hashing = [asyncio.create_task(busy.hash_password("secret")) for _ in range(count)]
+        await asyncio.sleep(0)
+        executor.release()
+        return await asyncio.gather(*hashing)
+
+    async def saturate():
+        running = [asyncio.create_task(busy.hash_password("secret")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordServiceBusy) as e:
+            await busy.hash_password("secret")
+        executor.release()
+        await asyncio.gather(*running)
+        return e.value, await hash_released(2)
+
+    busy_error, hashes = asyncio.run(saturate())
+
+    assert busy_error.status_code == 503
+    assert busy_error.headers == {"Retry-After": "1"}
+    assert all(password_hash.startswith("$argon2id$") for password_hash in hashes)
+
+
+def test_queue_limit_needs_a_slot():
+    with pytest.raises(ValueError):
+        SecuritySetting(jwt_secret="secret", password_hash_queue_limit=0)
+    with pytest.raises(ValueError):
+        PasswordService(**cheap_params, queue_limit=0, executor=BlockedExecutor())